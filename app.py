@@ -1,8 +1,32 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import requests
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+from urllib3.util import Timeout
+from urllib3.util.retry import Retry
+from streamlit.errors import StreamlitAPIException
 import json
 import base64
+import bisect
+import contextvars
+import hashlib
+import html
+import io
+import mimetypes
+import os
+import random
+import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import cached_property
 from datetime import datetime
 import time
 
@@ -63,6 +87,13 @@ st.markdown("""
         100% { background-position: 200% 50%; }
     }
     
+    .card-top {
+        display: flex;
+        justify-content: space-between;
+        align-items: flex-start;
+        gap: 12px;
+    }
+    
     .card-header {
         font-size: 1.4em;
         font-weight: 700;
@@ -137,6 +168,13 @@ st.markdown("""
         box-shadow: 0 4px 15px rgba(66, 153, 225, 0.3);
     }
     
+    .video-card mark {
+        background: #ffd93d;
+        color: inherit;
+        padding: 0 3px;
+        border-radius: 4px;
+    }
+    
     .video-container {
         margin: 20px 0;
         border-radius: 15px;
@@ -290,69 +328,1748 @@ st.markdown("""
 
 # Default configuration
 DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/13EGSQYUva5jutqW0hGmiPh_b1qIVsqGLcCwzoFNsj5g/edit?usp=drivesdk"
-WEBHOOK_URL = "https://agentonline-u29564.vm.elestio.app/webhook-test/98b5cc62-767d-484a-99cf-09c0ad616e92"
-IMAGE_WEBHOOK_URL = "https://agentonline-u29564.vm.elestio.app/webhook-test/2640efb5-c7cd-4859-9242-81e6ce776038"
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "https://agentonline-u29564.vm.elestio.app/webhook-test/98b5cc62-767d-484a-99cf-09c0ad616e92")
+IMAGE_WEBHOOK_URL = os.environ.get("IMAGE_WEBHOOK_URL", "https://agentonline-u29564.vm.elestio.app/webhook-test/2640efb5-c7cd-4859-9242-81e6ce776038")
 
-def load_data_from_gsheets(sheet_url):
-    """Load data from Google Sheets using a public URL"""
+# Outbound HTTP configuration: one pooled, keep-alive connection pool per endpoint
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_RETRY_TOTAL = int(os.environ.get("HTTP_RETRY_TOTAL", "3"))
+HTTP_RETRY_BACKOFF = float(os.environ.get("HTTP_RETRY_BACKOFF", "0.5"))  # 0.5 s, 1 s, 2 s, ...
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_POST_RETRY_STATUSES = (429, 503)  # refusals: the webhook never ran, so resending is safe
+HTTP_ENDPOINTS = {
+    "webhook": {"url": WEBHOOK_URL, "pool_size": 10, "read_timeout": 30, "post": True},
+    "image_webhook": {
+        "url": IMAGE_WEBHOOK_URL, "pool_size": 4, "read_timeout": 60, "post": True,
+        # "json" sends base64 inside a JSON body; "multipart" streams the raw bytes as form-data
+        "transport": os.environ.get("IMAGE_WEBHOOK_TRANSPORT", "json"),
+    },
+    "sheets": {"url": "https://docs.google.com/", "pool_size": 4, "read_timeout": 30},
+}
+HTTP_DEFAULT_POOL_SIZE = 4
+
+# Deadline of the latency budget the current call runs under (set by CircuitBreaker.guard)
+HTTP_DEADLINE = contextvars.ContextVar("http_deadline", default=None)
+
+class BudgetTimeout(Timeout):
+    """urllib3 timeout that caps each attempt, retries included, at the time left before a deadline"""
+
+    def __init__(self, connect, read, deadline):
+        remaining = max(deadline - time.monotonic(), 0.001)
+        super().__init__(connect=min(connect, remaining), read=min(read, remaining))
+        self.limits = (connect, read)
+        self.deadline = deadline
+
+    def clone(self):
+        # urllib3 clones the timeout for every attempt, so each one gets what is left
+        return BudgetTimeout(*self.limits, self.deadline)
+
+class BudgetRetry(Retry):
+    """Retry policy that gives up once the current call's latency budget can't cover the next backoff"""
+
+    def is_exhausted(self):
+        deadline = HTTP_DEADLINE.get()
+        if deadline is not None and time.monotonic() + self.get_backoff_time() >= deadline:
+            return True
+        return super().is_exhausted()
+
+def http_timeout(endpoint):
+    """Return the timeout for a named endpoint: (connect, read), capped by the current latency budget"""
+    connect, read = HTTP_CONNECT_TIMEOUT, HTTP_ENDPOINTS[endpoint]["read_timeout"]
+    deadline = HTTP_DEADLINE.get()
+    if deadline is None:
+        return (connect, read)
+    return BudgetTimeout(connect, read, deadline)
+
+def make_http_adapter(pool_size, post=False):
+    """Build a keep-alive connection pool that retries with exponential backoff.
+
+    GETs are retried on connection and read errors and on 429/5xx. Webhook
+    pools (post=True) send non-idempotent POSTs, so those are resent only
+    when the webhook never ran them: connection failures and 429/503
+    refusals. A read timeout is never retried, since the workflow may still
+    be running upstream.
+    """
+    if post:
+        retry = BudgetRetry(
+            total=HTTP_RETRY_TOTAL,
+            read=0,
+            other=0,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=HTTP_POST_RETRY_STATUSES,
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    else:
+        retry = BudgetRetry(
+            total=HTTP_RETRY_TOTAL,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    return HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+@st.cache_resource
+def get_http_session():
+    """Pooled HTTP session shared by every session in this process.
+
+    Each endpoint in HTTP_ENDPOINTS gets its own adapter (and so its own
+    connection pool and size limit); requests picks the adapter with the
+    longest matching URL prefix, and anything else uses the default pools.
+    """
+    session = requests.Session()
+    for prefix in ("http://", "https://"):
+        session.mount(prefix, make_http_adapter(HTTP_DEFAULT_POOL_SIZE))
+    for endpoint in HTTP_ENDPOINTS.values():
+        session.mount(endpoint["url"], make_http_adapter(endpoint["pool_size"], endpoint.get("post", False)))
+    return session
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or its exception). Nothing
+    is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+@st.cache_resource
+def get_single_flight():
+    """Coalescer for identical in-flight webhook calls, shared by every session"""
+    return SingleFlight()
+
+# Circuit breakers: once a webhook is known-bad, calls fail fast instead of waiting out timeouts
+CIRCUIT_WINDOW = int(os.environ.get("CIRCUIT_WINDOW", "20"))  # recent calls considered
+CIRCUIT_MIN_CALLS = int(os.environ.get("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.environ.get("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_COOLDOWN = float(os.environ.get("CIRCUIT_COOLDOWN", "30"))  # seconds open before a probe
+CIRCUIT_BUDGETS = {  # seconds per call, retries included; calls are cut off there and count as failures
+    "webhook": float(os.environ.get("WEBHOOK_LATENCY_BUDGET", "20")),
+    "image_webhook": float(os.environ.get("IMAGE_WEBHOOK_LATENCY_BUDGET", "45")),
+}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+class CircuitBreaker:
+    """Per-endpoint breaker: closed, open after too many failures, half-open to probe.
+
+    A call fails if it raises or takes longer than the latency budget, which
+    guard() also enforces: requests made inside it time out, and stop
+    retrying, when the budget runs out. Once
+    at least min_calls of the last window calls have completed and the
+    failure rate reaches the threshold, the circuit opens and calls are
+    rejected until the cooldown passes; then one probe is let through and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, budget, window=CIRCUIT_WINDOW, min_calls=CIRCUIT_MIN_CALLS,
+                 failure_rate=CIRCUIT_FAILURE_RATE, cooldown=CIRCUIT_COOLDOWN):
+        self.name = name
+        self.budget = budget
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a probe through"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def _admit(self):
+        with self._lock:
+            if self.state == "open":
+                if self.retry_in() > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        f"{self.name} is unavailable ({self.last_error}); retrying in {self.retry_in():.0f} s"
+                    )
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} is recovering; a probe request is in flight")
+                self.probing = True
+            self.calls += 1
+
+    def _record(self, ok, error=None):
+        with self._lock:
+            if not ok:
+                self.failures += 1
+                self.last_error = error
+            if self.state == "half_open":
+                self.probing = False
+                if ok:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self.state = "open"
+                    self.opened_at = time.monotonic()
+                return
+            self.outcomes.append(ok)
+            failed = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failed / len(self.outcomes) >= self.failure_rate:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """Run the enclosed call through the breaker within its budget, raising CircuitOpenError if rejected"""
+        self._admit()
+        started = time.monotonic()
+        deadline = HTTP_DEADLINE.set(started + self.budget)
+        try:
+            yield
+        except Exception as e:
+            self._record(False, str(e)[:200])
+            raise
+        finally:
+            HTTP_DEADLINE.reset(deadline)
+        elapsed = time.monotonic() - started
+        if elapsed > self.budget:
+            self.slow_calls += 1
+            self._record(False, f"took {elapsed:.1f} s, over the {self.budget:.0f} s budget")
+        else:
+            self._record(True)
+
+    def status(self):
+        """Snapshot of the breaker's state and counters for monitoring"""
+        with self._lock:
+            return {
+                "endpoint": self.name,
+                "state": self.state,
+                "recent_failure_rate": round(self.outcomes.count(False) / len(self.outcomes), 2) if self.outcomes else 0.0,
+                "retry_in_s": round(self.retry_in(), 1),
+                "calls": self.calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+@st.cache_resource
+def get_circuit_breakers():
+    """Circuit breakers for the webhook endpoints, shared by every session in this process"""
+    return {name: CircuitBreaker(name, budget) for name, budget in CIRCUIT_BUDGETS.items()}
+
+def circuit_notice(endpoint):
+    """Degraded-mode message for an endpoint whose circuit isn't closed, else None"""
+    breaker = get_circuit_breakers()[endpoint]
+    if breaker.state == "closed":
+        return None
+    if breaker.state == "open" and breaker.retry_in() > 0:
+        return f"Degraded mode: the service is failing, requests fail fast for {breaker.retry_in():.0f} s. Cached replies still work."
+    return "Degraded mode: checking whether the service has recovered."
+
+# Sheet cache configuration
+SHEET_CACHE_TTL = float(os.environ.get("SHEET_CACHE_TTL", "60"))  # seconds before a cached sheet is revalidated
+SHEET_SNAPSHOT_DIR = os.environ.get("SHEET_SNAPSHOT_DIR", ".sheet_snapshots")  # last good sheet per URL
+
+# Background poller configuration (seconds)
+SHEET_POLL_INTERVAL = float(os.environ.get("SHEET_POLL_INTERVAL", "30"))
+SHEET_POLL_JITTER = float(os.environ.get("SHEET_POLL_JITTER", "5"))
+SHEET_POLL_MAX_BACKOFF = float(os.environ.get("SHEET_POLL_MAX_BACKOFF", "300"))
+SHEET_POLL_IDLE_TIMEOUT = float(os.environ.get("SHEET_POLL_IDLE_TIMEOUT", "300"))  # stop when nobody is watching
+SHEET_VERSION_CHECK_INTERVAL = 5  # how often each session checks for a newer version
+
+def resolve_csv_url(sheet_url):
+    """Resolve a Google Sheets share URL to its CSV export URL"""
+    if 'docs.google.com/spreadsheets' in sheet_url:
+        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+        return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
+    return sheet_url
+
+# Declared schema for the video sheet, applied once per download
+SHEET_TEXT_COLUMNS = ["Idea", "Caption", "Prompt", "environment_prompt", "final_output"]
+SHEET_TEXT_DTYPE = "string[pyarrow]"
+SHEET_DETAIL_COLUMNS = ["Caption", "Prompt", "environment_prompt"]  # long text, only read for opened cards
+
+def parse_sheet_csv(content):
+    """Parse the sheet's CSV export into compact, typed columns.
+
+    Text columns are read straight into Arrow-backed strings, `Id` becomes a
+    nullable integer (non-numeric or fractional Ids become NA), `Date` is parsed to naive datetime64 in UTC
+    (unparseable values become NaT) and `production` is normalized (trimmed,
+    lower-cased) into a categorical, so downstream filters compare codes
+    instead of strings.
+    """
+    dtypes = {col: SHEET_TEXT_DTYPE for col in SHEET_TEXT_COLUMNS}
+    dtypes["production"] = SHEET_TEXT_DTYPE
+    df = pd.read_csv(io.BytesIO(content), dtype=dtypes)
+
+    if "Id" in df.columns:
+        ids = pd.to_numeric(df["Id"], errors="coerce")
+        # Non-integral Ids (e.g. 2.5) become NA like non-numeric ones instead of failing the cast
+        df["Id"] = ids.where(ids.isna() | (ids % 1 == 0)).astype("Int64")
+    if "Date" in df.columns:
+        # Offsets (mixed or not) are normalized to UTC, then dropped, so Date is always naive
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce", format="mixed", utc=True).dt.tz_convert(None)
+    if "production" in df.columns:
+        status = df["production"].str.strip().str.lower()
+        df["production"] = status.mask(status == "").astype("category")
+    return combine_text_chunks(df)
+
+def combine_text_chunks(df):
+    """Store each Arrow string column as a single chunk.
+
+    read_csv and read_parquet hand back one chunk per parser block, and
+    Arrow's take() concatenates every chunk first, so fetching a page of
+    rows from a chunked column would copy the whole column.
+    """
+    for col in df.columns:
+        if df[col].dtype == SHEET_TEXT_DTYPE:
+            chunks = pa.chunked_array(pa.array(df[col].array))
+            if chunks.num_chunks > 1:
+                df[col] = pd.Series(pd.arrays.ArrowStringArray(chunks.combine_chunks()), index=df.index, name=col)
+    return df
+
+@dataclass
+class SheetIndex:
+    """Row masks and aggregate counts derived once per sheet version.
+
+    Masks are boolean arrays aligned with the snapshot DataFrame's rows, so
+    SheetView can combine them into row selections without touching the
+    string columns again.
+    """
+    status_masks: dict  # normalized status -> row mask
+    done: np.ndarray
+    has_video: np.ndarray
+    counts: dict  # total / done / pending / with_video / undated / no_id
+    sort_orders: dict  # sort option -> permutation of row positions in that order
+    date_order: np.ndarray  # positions of rows with a parseable Date, oldest first
+    sorted_dates: np.ndarray  # their dates, ascending, for binary search
+
+def build_sheet_index(df):
+    """Compute status masks, the has-video mask and metric counts for a sheet"""
+    status_masks = {}
+    done = np.zeros(len(df), dtype=bool)
+    if "production" in df.columns:
+        codes = df["production"].cat.codes.to_numpy()
+        for code, status in enumerate(df["production"].cat.categories):
+            status_masks[status] = codes == code
+        done = status_masks.get("done", done)
+
+    has_video = np.zeros(len(df), dtype=bool)
+    if "final_output" in df.columns:
+        has_video = (df["final_output"].str.strip() != "").fillna(False).to_numpy(dtype=bool)
+
+    date_order = np.arange(0)
+    sorted_dates = np.array([], dtype="datetime64[us]")
+    dates = naive_dates(df)
+    if dates is not None:
+        dates = dates.to_numpy()
+        dated = np.flatnonzero(~np.isnat(dates))
+        date_order = dated[np.argsort(dates[dated], kind="stable")]
+        sorted_dates = dates[date_order]
+
+    counts = {
+        "total": len(df),
+        "done": int(done.sum()),
+        "pending": len(df) - int(done.sum()),
+        "with_video": int(has_video.sum()),
+        "undated": len(df) - len(date_order),
+        "no_id": int(df["Id"].isna().sum()) if "Id" in df.columns else 0,
+    }
+    return SheetIndex(status_masks, done, has_video, counts, build_sort_orders(df), date_order, sorted_dates)
+
+def date_range_positions(index, date_from=None, date_to=None):
+    """Positions of rows dated within [date_from, date_to]; either end may be None (open).
+
+    Two binary searches over the sorted dates; rows without a parseable date
+    never match.
+    """
+    dates = index.sorted_dates
+    lo = 0 if date_from is None else np.searchsorted(dates, np.datetime64(date_from, "D").astype(dates.dtype), "left")
+    hi = len(dates)
+    if date_to is not None:
+        # The whole end day counts: stop before midnight of the next one
+        next_day = (np.datetime64(date_to, "D") + 1).astype(dates.dtype)
+        hi = np.searchsorted(dates, next_day, "left")
+    return index.date_order[lo:max(lo, hi)]
+
+def build_sort_orders(df):
+    """Argsort the sheet once per sort option; rows missing the key sort last, ties keep sheet order"""
+    orders = {}
+    if "Id" in df.columns:
+        ids = df["Id"].to_numpy(dtype=float, na_value=np.nan)
+        orders["Id (Newest)"] = np.argsort(-ids, kind="stable")  # -NaN is still NaN, so still last
+        orders["Id (Oldest)"] = np.argsort(ids, kind="stable")
+    if "production" in df.columns:
+        codes = df["production"].cat.codes.to_numpy()
+        orders["Status"] = np.argsort(np.where(codes < 0, np.iinfo(codes.dtype).max, codes), kind="stable")
+    dates = naive_dates(df)
+    if dates is not None:
+        seconds = (dates - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+        orders["Date"] = np.argsort(-seconds, kind="stable")  # newest first, unparseable dates last
+    return orders
+
+def naive_dates(df):
+    """The Date column as naive datetime64, tz-aware values converted to UTC; None without a datetime Date"""
+    if "Date" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+        return None
+    dates = df["Date"]
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_convert(None)
+    return dates
+
+# Full-text search configuration
+SEARCH_FIELDS = ["Idea", "Caption", "Prompt", "environment_prompt"]
+SEARCH_FIELD_WEIGHTS = {"Idea": 3.0, "Caption": 2.0, "environment_prompt": 1.5, "Prompt": 1.0}
+SEARCH_EXACT_BOOST = 2.0  # score multiplier for whole-word matches over prefix matches
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Split text into case-folded word tokens"""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class SearchIndex:
+    """Inverted index over the sheet's text columns.
+
+    Postings (row, score) are stored sorted by token, so every token sharing
+    a prefix occupies one contiguous slice that two binary searches over the
+    vocabulary find. A row's score for a token is the sum over fields of
+    field weight x term frequency. Queries AND their terms together, treat
+    each term as a prefix and rank rows by total score.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        tokens = []
+        rows = [np.array([], dtype=np.int64)]
+        weights = [np.array([], dtype=float)]
+        for field in SEARCH_FIELDS:
+            if field not in df.columns:
+                continue
+            field_tokens = [tokenize(text) for text in df[field].fillna("").to_numpy(dtype=object)]
+            lengths = np.fromiter(map(len, field_tokens), dtype=np.int64, count=len(field_tokens))
+            tokens.extend(token for row_tokens in field_tokens for token in row_tokens)
+            rows.append(np.repeat(np.arange(len(df), dtype=np.int64), lengths))
+            weights.append(np.full(lengths.sum(), SEARCH_FIELD_WEIGHTS[field]))
+
+        # One posting per (token, row), ordered by token then row
+        codes, vocab = pd.factorize(np.array(tokens, dtype=object), sort=True)
+        stride = max(self.n_rows, 1)
+        keys, inverse = np.unique(codes.astype(np.int64) * stride + np.concatenate(rows), return_inverse=True)
+        self.scores = np.bincount(inverse, weights=np.concatenate(weights), minlength=len(keys))
+        self.rows = keys % stride
+        self.vocab = list(vocab)
+        self.offsets = np.searchsorted(keys // stride, np.arange(len(self.vocab) + 1))
+
+    def search(self, query):
+        """Return positions of rows matching every query term, best match first"""
+        terms = tokenize(query)
+        if not terms:
+            return np.arange(self.n_rows)
+
+        total = np.zeros(self.n_rows)
+        matched = np.ones(self.n_rows, dtype=bool)
+        for term in terms:
+            lo = bisect.bisect_left(self.vocab, term)
+            hi = bisect.bisect_left(self.vocab, term + "\U0010ffff")
+            start, end = self.offsets[lo], self.offsets[hi]
+            scores = self.scores[start:end].copy()
+            if lo < hi and self.vocab[lo] == term:
+                scores[:self.offsets[lo + 1] - start] *= SEARCH_EXACT_BOOST
+            term_scores = np.bincount(self.rows[start:end], weights=scores, minlength=self.n_rows)
+            matched &= term_scores > 0
+            total += term_scores
+
+        hits = np.flatnonzero(matched)
+        return hits[np.argsort(-total[hits], kind="stable")]
+
+def search_term_pattern(query):
+    """Regex matching words that start with any term of a search query"""
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\w*", re.IGNORECASE)
+
+def highlight_matches(text, pattern):
+    """HTML-escape text, wrapping words matched by a search pattern in <mark> tags"""
+    if pattern is None:
+        return html.escape(text)
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return "".join(parts)
+
+@dataclass
+class SheetSnapshot:
+    """A versioned view of the sheet plus what changed since the previous one"""
+    version: int
+    df: pd.DataFrame
+    row_hashes: pd.Series  # one uint64 hash per row, indexed by row key
+    diff: dict  # {"added": [...], "updated": [...], "removed": [...]} row keys, plus "reloaded" if unmatchable
+    _search_index: SearchIndex = field(default=None, init=False, repr=False, compare=False)
+    _search_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    @cached_property
+    def index(self):
+        """Status/metric index for this version, built on first use"""
+        return build_sheet_index(self.df)
+
+    @property
+    def search_index(self):
+        """Full-text search index for this version, built once even when sessions search concurrently"""
+        with self._search_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex(self.df)
+            return self._search_index
+
+    @cached_property
+    def view(self):
+        """Memoized filter/sort pipeline over this version, shared by every session"""
+        return SheetView(self)
+
+    def warm(self):
+        """Build the derived indexes now instead of on a viewer's first use"""
+        self.index
+        self.search_index
+
+# View pipeline: filter -> sort -> page over row positions, each stage memoized per version
+VIEW_CACHE_SIZE = int(os.environ.get("VIEW_CACHE_SIZE", "64"))  # stage results kept per sheet version
+
+@dataclass(frozen=True)
+class ViewQuery:
+    """What a session is looking at; a page is then just a slice of the sorted result"""
+    status: str = "All"
+    search: str = ""
+    nav: str = "All Videos"
+    sort_by: str = "Id (Newest)"
+    date_from: object = None  # datetime.date, or None for an open start
+    date_to: object = None  # datetime.date, or None for an open end
+
+    @property
+    def filters_by_date(self):
+        return self.date_from is not None or self.date_to is not None
+
+class SheetView:
+    """Filter and sort a snapshot as arrays of row positions, caching each stage.
+
+    Stage results are keyed by their inputs only (the snapshot fixes the
+    version), so changing the page reuses the sorted positions, changing the
+    sort reuses the filtered positions, and every session viewing the same
+    version shares them. Only the rows on the requested page are copied.
+    """
+
+    def __init__(self, snapshot, cache_size=VIEW_CACHE_SIZE):
+        self.snapshot = snapshot
+        self._stages = LRUCache(cache_size)
+
+    def _memo(self, key, compute):
+        result = self._stages.get(key)
+        if result is None:
+            result = compute()
+            self._stages.put(key, result)
+        return result
+
+    def search_hits(self, term):
+        """Positions of rows matching a search term, best match first"""
+        return self._memo(("search", term), lambda: self.snapshot.search_index.search(term))
+
+    def filtered(self, query):
+        """Positions of rows passing the query's status, search and navigation filters"""
+        key = ("filter", query.status, query.search, query.nav, query.date_from, query.date_to)
+        return self._memo(key, lambda: self._filter(query))
+
+    def _filter(self, query):
+        df, index = self.snapshot.df, self.snapshot.index
+        mask = np.ones(len(df), dtype=bool)
+        if query.status != "All" and query.status in index.status_masks:
+            mask &= index.status_masks[query.status]
+        if query.search:
+            matched = np.zeros(len(df), dtype=bool)
+            matched[self.search_hits(query.search)] = True
+            mask &= matched
+        if query.filters_by_date:
+            in_range = np.zeros(len(df), dtype=bool)
+            in_range[date_range_positions(index, query.date_from, query.date_to)] = True
+            mask &= in_range
+        if query.nav == "Completed":
+            mask &= index.done
+        elif query.nav == "Pending":
+            mask &= ~index.done
+        elif query.nav == "With Video":
+            mask &= index.has_video
+        positions = np.flatnonzero(mask)
+        if query.nav == "Recent" and "Id" in df.columns:
+            # The 10 highest Ids, highest first
+            ids = df["Id"].to_numpy(dtype=float, na_value=np.nan)[positions]
+            keep = np.argsort(-ids, kind="stable")[:10]
+            positions = positions[keep[~np.isnan(ids[keep])]]
+        return positions
+
+    def sorted(self, query):
+        """Filtered positions in the query's sort order"""
+        return self._memo(("sort", query), lambda: self._sort(query))
+
+    def _sort(self, query):
+        # Walk a precomputed permutation and keep the selected rows: O(n) for
+        # any sort key. Relevance walks the search hits, already in rank order.
+        positions = self.filtered(query)
+        if query.sort_by == "Relevance" and query.search:
+            order = self.search_hits(query.search)
+        else:
+            order = self.snapshot.index.sort_orders.get(query.sort_by)
+            if order is None:
+                return positions
+        selected = np.zeros(len(self.snapshot.df), dtype=bool)
+        selected[positions] = True
+        return order[selected[order]]
+
+    def page(self, query, page, page_size, summary_only=False):
+        """The rows on a 1-based page of the sorted view, without SHEET_DETAIL_COLUMNS if summary_only"""
+        positions = self.sorted(query)
+        start = (page - 1) * page_size
+        df = self.summary_frame if summary_only else self.snapshot.df
+        return df.iloc[positions[start:start + page_size]]
+
+    @cached_property
+    def summary_frame(self):
+        """The snapshot without SHEET_DETAIL_COLUMNS (copy-on-write, so no data is copied)"""
+        df = self.snapshot.df
+        return df[[col for col in df.columns if col not in SHEET_DETAIL_COLUMNS]]
+
+    def details(self, position, row):
+        """Complete a summary row with its detail columns, read from the snapshot only now"""
+        missing = [col for col in SHEET_DETAIL_COLUMNS if col in self.snapshot.df.columns and col not in row.index]
+        if not missing:
+            return row
+        return pd.concat([row, self.snapshot.df[missing].iloc[position]])
+
+def row_keys(df):
+    """Key rows by Id when it is present and unique, by position otherwise"""
+    if "Id" in df.columns and df["Id"].notna().all() and df["Id"].is_unique:
+        return pd.Index(df["Id"])
+    return pd.RangeIndex(len(df))
+
+def keyed_by_id(row_hashes):
+    """Whether a row hash series is keyed by Id rather than by position (see row_keys)"""
+    return not isinstance(row_hashes.index, pd.RangeIndex)
+
+def compute_row_hashes(df):
+    """Hash every row's values so changed rows can be found without comparing cells"""
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    hashes.index = row_keys(df)
+    return hashes
+
+def diff_row_hashes(old_hashes, new_hashes):
+    """Return the row keys added, updated and removed between two hash series"""
+    common = new_hashes.index.intersection(old_hashes.index)
+    changed = new_hashes.loc[common].to_numpy() != old_hashes.loc[common].to_numpy()
+    return {
+        "added": new_hashes.index.difference(old_hashes.index).tolist(),
+        "updated": common[changed].tolist(),
+        "removed": old_hashes.index.difference(new_hashes.index).tolist(),
+    }
+
+def sync_snapshot(previous, df):
+    """Merge a freshly downloaded sheet into the previous snapshot.
+
+    The previous snapshot is returned untouched (same version) when no row,
+    column or ordering changed, so anything keyed by version stays valid.
+    """
+    row_hashes = compute_row_hashes(df)
+    if previous is None:
+        diff = {"added": row_hashes.index.tolist(), "updated": [], "removed": []}
+        return SheetSnapshot(1, df, row_hashes, diff)
+
+    if keyed_by_id(row_hashes) != keyed_by_id(previous.row_hashes):
+        # Id keys and positions can't be matched up, so report a full reload instead of a row diff
+        diff = {"added": [], "updated": [], "removed": [], "reloaded": True}
+        return SheetSnapshot(previous.version + 1, df, row_hashes, diff)
+
+    diff = diff_row_hashes(previous.row_hashes, row_hashes)
+    unchanged = (
+        not any(diff.values())
+        and list(df.columns) == list(previous.df.columns)
+        and row_hashes.index.equals(previous.row_hashes.index)
+    )
+    if unchanged:
+        return previous
+    return SheetSnapshot(previous.version + 1, df, row_hashes, diff)
+
+def describe_diff(diff):
+    """Summarize a snapshot diff for the UI, e.g. '3 videos updated, 1 added'"""
+    if diff.get("reloaded"):
+        return "Sheet reloaded: its rows couldn't be matched to the previous version by Id"
+    parts = []
+    if diff["updated"]:
+        parts.append(f"{len(diff['updated'])} videos updated")
+    if diff["added"]:
+        parts.append(f"{len(diff['added'])} added")
+    if diff["removed"]:
+        parts.append(f"{len(diff['removed'])} removed")
+    return ", ".join(parts)
+
+def snapshot_paths(csv_url):
+    """Return the (Arrow, metadata) file paths for a sheet's on-disk snapshot"""
+    name = hashlib.sha1(csv_url.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(SHEET_SNAPSHOT_DIR, name)
+    return f"{base}.arrow", f"{base}.json"
+
+def map_snapshot_frame(data_path):
+    """Open a snapshot's Arrow file as a DataFrame whose columns live in the file.
+
+    The file is memory-mapped and the Arrow-backed columns wrap its pages
+    without copying, so the sheet's long text sits in the OS page cache
+    (shared between processes and reclaimable) instead of this process's
+    heap, and only the rows actually read are paged in.
+    """
+    table = pa.ipc.open_file(pa.memory_map(data_path)).read_all()
+    return combine_text_chunks(table.to_pandas())
+
+def release_arrow_memory():
+    """Return Arrow's cached free pages to the OS.
+
+    Parsing, hashing and indexing a sheet allocate whole-column temporaries
+    that Arrow's allocator would otherwise keep around, undoing the savings
+    of serving the text from a memory-mapped file.
+    """
+    pa.default_memory_pool().release_unused()
+
+def save_snapshot_to_disk(csv_url, entry):
+    """Persist a cache entry's snapshot as an uncompressed Arrow file plus its validators as JSON.
+
+    Returns the entry with its snapshot reading from the memory-mapped file,
+    or the entry unchanged if the file could not be written.
+    """
+    data_path, meta_path = snapshot_paths(csv_url)
+    try:
+        os.makedirs(SHEET_SNAPSHOT_DIR, exist_ok=True)
+        table = pa.Table.from_pandas(entry["snapshot"].df, preserve_index=False)
+        with pa.OSFile(f"{data_path}.tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({
+                "csv_url": csv_url,
+                "version": entry["snapshot"].version,
+                "etag": entry["etag"],
+                "last_modified": entry["last_modified"],
+                "content_hash": entry["content_hash"],
+                "saved_at": time.time(),
+            }, f)
+        # Swap both files in only once they are fully written; a previous
+        # version still mapped by open sessions keeps its old file contents
+        os.replace(f"{data_path}.tmp", data_path)
+        os.replace(f"{meta_path}.tmp", meta_path)
+        df = map_snapshot_frame(data_path)
+    except Exception:
+        # The disk copy is an optimization; keep serving from memory rather than fail a load
+        return entry
+    return {**entry, "snapshot": replace(entry["snapshot"], df=df)}
+
+def load_snapshot_from_disk(csv_url):
+    """Load the last persisted snapshot for csv_url as a stale cache entry, or None"""
+    data_path, meta_path = snapshot_paths(csv_url)
     try:
-        if 'docs.google.com/spreadsheets' in sheet_url:
-            sheet_id = sheet_url.split('/d/')[1].split('/')[0]
-            csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
+        with open(meta_path) as f:
+            meta = json.load(f)
+        df = map_snapshot_frame(data_path)
+    except Exception:
+        return None
+    empty_diff = {"added": [], "updated": [], "removed": []}
+    row_hashes = compute_row_hashes(df)
+    release_arrow_memory()
+    return {
+        "snapshot": SheetSnapshot(meta["version"], df, row_hashes, empty_diff),
+        "etag": meta["etag"],
+        "last_modified": meta["last_modified"],
+        "content_hash": meta["content_hash"],
+        "checked_at": 0.0,
+    }
+
+class SheetCache:
+    """Process-wide cache of sheet snapshots keyed by CSV export URL.
+
+    Entries are served from memory until they are older than the TTL, then
+    revalidated with a conditional request (ETag / Last-Modified). When the
+    server sends neither, the downloaded body is compared by content hash so
+    an unchanged sheet is never re-parsed. Changed sheets are merged into the
+    previous snapshot with sync_snapshot().
+
+    Every new snapshot is also written to SHEET_SNAPSHOT_DIR and then served
+    from that memory-mapped file, so the sheet's text is not held on the
+    process heap. On a cold start the disk copy is served immediately and,
+    like any expired entry, is revalidated in a background thread
+    (stale-while-revalidate). Only a sheet that has never been seen, or one
+    explicitly invalidated, blocks on the network; if that refresh fails the
+    cached snapshot keeps being served and the error is kept in last_error
+    until a later refresh succeeds. Non-Google URLs are fetched as-is, so a
+    local HTTP server can stand in for the Sheets export endpoint.
+
+    Every snapshot published or loaded from disk has its indexes built in a
+    background thread, so the first search after a new version doesn't pay
+    for it.
+    """
+
+    def __init__(self, http, ttl=SHEET_CACHE_TTL):
+        self.http = http
+        self.ttl = ttl
+        self.last_error = {}
+        self._entries = {}
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def get(self, csv_url, force_refresh=False):
+        """Return the SheetSnapshot for csv_url, revalidating it if stale"""
+        with self._lock:
+            entry = self._entries.get(csv_url)
+            if entry is None and not force_refresh:
+                entry = load_snapshot_from_disk(csv_url)
+                if entry:
+                    self._entries[csv_url] = entry
+                    self._warm_in_background(entry["snapshot"])
+
+        if entry and not force_refresh and not entry.get("invalidated"):
+            if time.time() - entry["checked_at"] >= self.ttl:
+                self._refresh_in_background(csv_url)
+            return entry["snapshot"]
+
+        try:
+            return self.refresh(csv_url)
+        except Exception as e:
+            if entry is None:
+                raise
+            # Keep serving the last good snapshot; background revalidation retries once it is stale
+            self.last_error[csv_url] = str(e)
+            with self._lock:
+                entry["invalidated"] = False
+            return entry["snapshot"]
+
+    def refresh(self, csv_url):
+        """Revalidate csv_url against the server now and return its snapshot.
+
+        Concurrent refreshes of the same URL share one upstream request.
+        """
+        return self._flights.do(csv_url, lambda: self._refresh(csv_url))
+
+    def _refresh(self, csv_url):
+        with self._lock:
+            entry = self._entries.get(csv_url)
+        new_entry = self._revalidate(csv_url, entry)
+        if entry is None or new_entry["snapshot"] is not entry["snapshot"]:
+            # Publish the disk-backed copy so the parsed frame can be freed
+            new_entry = save_snapshot_to_disk(csv_url, new_entry)
+            release_arrow_memory()
+            self._warm_in_background(new_entry["snapshot"])
+        with self._lock:
+            self._entries[csv_url] = new_entry
+        self.last_error.pop(csv_url, None)
+        return new_entry["snapshot"]
+
+    def peek(self, csv_url):
+        """Return the cached snapshot for csv_url without any network access"""
+        with self._lock:
+            entry = self._entries.get(csv_url)
+        return entry["snapshot"] if entry else None
+
+    def invalidate(self, csv_url=None):
+        """Mark one URL (or every URL) so the next get() revalidates it before returning"""
+        with self._lock:
+            urls = [csv_url] if csv_url else list(self._entries)
+            for url in urls:
+                if url in self._entries:
+                    self._entries[url]["invalidated"] = True
+
+    def _refresh_in_background(self, csv_url):
+        with self._lock:
+            if csv_url in self._refreshing:
+                return
+            self._refreshing.add(csv_url)
+
+        def run():
+            try:
+                self.refresh(csv_url)
+            except Exception as e:
+                # Keep serving the stale snapshot; the next get() will retry
+                self.last_error[csv_url] = str(e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(csv_url)
+
+        threading.Thread(target=run, name="sheet-refresh", daemon=True).start()
+
+    def _warm_in_background(self, snapshot):
+        threading.Thread(target=snapshot.warm, name="sheet-warm", daemon=True).start()
+
+    def _revalidate(self, csv_url, entry):
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.http.get(csv_url, headers=headers, timeout=http_timeout("sheets"))
+        now = time.time()
+        if entry and response.status_code == 304:
+            return {**entry, "checked_at": now, "invalidated": False}
+        response.raise_for_status()
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        previous = entry["snapshot"] if entry else None
+        if entry and entry["content_hash"] == content_hash:
+            snapshot = previous
         else:
-            csv_url = sheet_url
-            
-        df = pd.read_csv(csv_url)
-        return df
+            snapshot = sync_snapshot(previous, parse_sheet_csv(response.content))
+
+        return {
+            "snapshot": snapshot,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": content_hash,
+            "checked_at": now,
+        }
+
+@st.cache_resource
+def get_sheet_cache():
+    """Sheet cache shared by every session in this process"""
+    return SheetCache(get_http_session())
+
+class SheetPoller:
+    """Process-wide background poller that keeps watched sheets fresh.
+
+    One daemon thread per sheet URL refreshes the SheetCache every
+    interval (plus random jitter), backing off exponentially on failures.
+    Sessions call watch() to keep a URL's thread alive and compare the cached
+    snapshot version with the one they rendered, so N viewers cost a single
+    upstream fetch per interval. A thread exits once no session has watched
+    its URL for idle_timeout seconds.
+    """
+
+    def __init__(self, cache, interval=SHEET_POLL_INTERVAL, jitter=SHEET_POLL_JITTER,
+                 max_backoff=SHEET_POLL_MAX_BACKOFF, idle_timeout=SHEET_POLL_IDLE_TIMEOUT):
+        self.cache = cache
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self.last_error = {}
+        self._last_watched = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def watch(self, csv_url):
+        """Register interest in csv_url, starting its poller thread if needed"""
+        with self._lock:
+            self._last_watched[csv_url] = time.time()
+            thread = self._threads.get(csv_url)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._run, args=(csv_url,), name="sheet-poller", daemon=True)
+                self._threads[csv_url] = thread
+                thread.start()
+
+    def _run(self, csv_url):
+        failures = 0
+        while True:
+            with self._lock:
+                if time.time() - self._last_watched.get(csv_url, 0) > self.idle_timeout:
+                    self._threads.pop(csv_url, None)
+                    return
+            try:
+                self.cache.refresh(csv_url).warm()
+                self.last_error.pop(csv_url, None)
+                failures = 0
+                delay = self.interval
+            except Exception as e:
+                self.last_error[csv_url] = str(e)
+                failures += 1
+                delay = min(self.interval * 2 ** failures, self.max_backoff)
+            time.sleep(delay + random.uniform(0, self.jitter))
+
+@st.cache_resource
+def get_sheet_poller():
+    """Sheet poller shared by every session in this process"""
+    return SheetPoller(get_sheet_cache())
+
+def load_sheet_snapshot(sheet_url, force_refresh=False):
+    """Load the current SheetSnapshot for a public Google Sheets URL"""
+    try:
+        csv_url = resolve_csv_url(sheet_url)
+        cache = get_sheet_cache()
+        snapshot = cache.get(csv_url, force_refresh=force_refresh)
+        error = cache.last_error.get(csv_url)
+        if error:
+            st.warning(f"⚠️ Could not refresh the sheet ({error}); showing cached data.")
+        return snapshot
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def send_to_webhook(message):
-    """Send message to webhook and get response"""
-    try:
-        payload = {"message": message, "user": "streamlit_user"}
-        response = requests.post(
+def load_data_from_gsheets(sheet_url, force_refresh=False):
+    """Load data from Google Sheets using a public URL"""
+    snapshot = load_sheet_snapshot(sheet_url, force_refresh=force_refresh)
+    return snapshot.df if snapshot is not None else None
+
+def extract_reply_text(data):
+    """Pull the reply text out of a decoded webhook JSON value"""
+    if isinstance(data, dict):
+        for key in ("response", "content", "text", "token"):
+            if isinstance(data.get(key), str):
+                return data[key]
+        return ""
+    return str(data)
+
+def read_webhook_reply(response, on_chunk=None):
+    """Read a webhook reply, passing text to on_chunk as it arrives when the body is streamed.
+
+    Server-sent events and newline-delimited JSON are read line by line,
+    other text bodies chunk by chunk; a plain JSON body is read whole.
+    """
+    content_type = response.headers.get("Content-Type", "")
+    if "application/json" in content_type:
+        return response.json().get('response', 'No response received')
+
+    parts = []
+    if "text/event-stream" in content_type or "ndjson" in content_type:
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if line.startswith("data:"):
+                line = line[len("data:"):].strip()
+            if not line or line == "[DONE]":
+                continue
+            try:
+                chunk = extract_reply_text(json.loads(line))
+            except ValueError:
+                chunk = line
+            parts.append(chunk)
+            if on_chunk and chunk:
+                on_chunk(chunk)
+    else:
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode("utf-8", errors="replace")
+            parts.append(chunk)
+            if on_chunk and chunk:
+                on_chunk(chunk)
+    return "".join(parts) or 'No response received'
+
+# Webhook replies are cached by content so repeated prompts skip the LLM round trip
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "sqlite")  # "sqlite" or "memory"
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", ".response_cache.sqlite3")
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", str(24 * 3600)))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+def response_cache_key(url, *parts):
+    """Content-address a webhook request: hash the URL it goes to and its inputs (bytes are hashed too)"""
+    digest = hashlib.sha256(url.encode("utf-8"))
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+class MemoryResponseStore:
+    """In-process response store, bounded by LRU eviction"""
+
+    def __init__(self, max_entries):
+        self._lru = LRUCache(max_entries)
+
+    def get(self, key):
+        return self._lru.get(key)
+
+    def put(self, key, value, stored_at):
+        self._lru.put(key, (value, stored_at))
+
+    def delete(self, key):
+        self._lru.delete(key)
+
+class SQLiteResponseStore:
+    """On-disk response store that survives restarts, bounded by least-recently-used eviction"""
+
+    def __init__(self, path, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+                self._db.commit()
+        return row
+
+    def put(self, key, value, stored_at):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, stored_at, stored_at)
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+class ResponseCache:
+    """TTL cache of webhook replies over a pluggable store, with hit/miss counters"""
+
+    def __init__(self, store, ttl=RESPONSE_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.store.get(key)
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            self.store.delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        self.store.put(key, value, time.time())
+
+@st.cache_resource
+def get_response_cache():
+    """Webhook response cache shared by every session in this process"""
+    if RESPONSE_CACHE_BACKEND == "sqlite":
+        store = SQLiteResponseStore(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_ENTRIES)
+    else:
+        store = MemoryResponseStore(RESPONSE_CACHE_MAX_ENTRIES)
+    return ResponseCache(store)
+
+def request_chat_reply(message, on_chunk=None):
+    """Send message to webhook and return its reply, raising on failure or an open circuit"""
+    payload = {"message": message, "user": "streamlit_user"}
+    with get_circuit_breakers()["webhook"].guard():
+        response = get_http_session().post(
             WEBHOOK_URL, 
             json=payload, 
             headers={'Content-Type': 'application/json'},
-            timeout=30
+            timeout=http_timeout("webhook"),
+            stream=True
         )
         
-        if response.status_code == 200:
-            return response.json().get('response', 'No response received')
-        else:
-            return f"Error: {response.status_code} - {response.text}"
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return read_webhook_reply(response, on_chunk)
+
+def send_to_webhook(message, on_chunk=None, use_cache=True):
+    """Send message to webhook and get response, streaming partial text to on_chunk.
+
+    Successful replies are cached by webhook URL and message; use_cache=False regenerates.
+    """
+    try:
+        cache = get_response_cache()
+        key = response_cache_key(WEBHOOK_URL, message)
+        if use_cache:
+            reply = cache.get(key)
+            if reply is not None:
+                if on_chunk:
+                    on_chunk(reply)
+                return reply
+
+        streamed = []
+
+        def fetch():
+            streamed.append(True)
+            reply = request_chat_reply(message, on_chunk)
+            cache.put(key, reply)
+            return reply
+
+        # Identical requests already in flight share the leader's reply;
+        # followers receive it in one piece once the leader finishes
+        reply = get_single_flight().do(key, fetch)
+        if on_chunk and not streamed:
+            on_chunk(reply)
+        return reply
     except Exception as e:
         return f"Error sending message: {str(e)}"
 
-def send_image_to_webhook(image_data, filename, prompt="Analyze this image and suggest creative video ideas"):
-    """Send image to image webhook and get response"""
-    try:
-        # Convert image to base64
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        
-        payload = {
-            "image": image_base64,
-            "filename": filename,
-            "prompt": prompt,
-            "user": "streamlit_user"
-        }
-        
-        response = requests.post(
-            IMAGE_WEBHOOK_URL,
+# Chat requests run on a shared executor so a slow webhook never blocks a script run
+CHAT_MAX_WORKERS = int(os.environ.get("CHAT_MAX_WORKERS", "8"))
+CHAT_POLL_INTERVAL = 0.5  # seconds between checks on a running chat job
+
+@st.cache_resource
+def get_chat_executor():
+    """Thread pool for chat webhook calls, shared by every session in this process"""
+    return ThreadPoolExecutor(max_workers=CHAT_MAX_WORKERS, thread_name_prefix="chat")
+
+class ChatJob:
+    """Handle for a chat request running on the chat executor"""
+
+    def __init__(self, label, message):
+        self.label = label  # what the chat history shows as the user's message
+        self.message = message  # what was sent to the webhook
+        self.replaces_last = False  # regenerations overwrite the previous reply
+        self.future = None
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    def append(self, chunk):
+        with self._lock:
+            self._chunks.append(chunk)
+
+    @property
+    def partial_text(self):
+        with self._lock:
+            return "".join(self._chunks)
+
+    @property
+    def done(self):
+        return self.future.done()
+
+def submit_chat_job(label, message, use_cache=True):
+    """Start sending message to the webhook in the background and return its ChatJob"""
+    job = ChatJob(label, message)
+    job.future = get_chat_executor().submit(send_to_webhook, message, job.append, use_cache)
+    return job
+
+# Batch prompts: many messages keyed by row Id, sent in batches on their own bounded pool
+WEBHOOK_BATCH_SIZE = int(os.environ.get("WEBHOOK_BATCH_SIZE", "1"))  # >1 needs a webhook that accepts {"messages": [...]}
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "4"))
+
+@st.cache_resource
+def get_batch_executor():
+    """Thread pool for batch webhook calls, kept apart from interactive chat"""
+    return ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="batch")
+
+BATCH_FIELD_PATTERN = re.compile(r"\{(\w+)\}")
+
+def rows_missing(df, column):
+    """Rows of df whose column is empty or blank"""
+    values = df[column]
+    return df[(values.isna() | (values.astype("string").str.strip() == "")).to_numpy()]
+
+def batch_messages(df, template):
+    """Build (Id, message) pairs by filling template's {Column} fields from each row.
+
+    Only {Name} where Name is a column of df is replaced; any other text,
+    braces included, is sent as typed.
+    """
+    items = []
+    for row in df.to_dict("records"):
+        def field(match):
+            name = match.group(1)
+            if name not in row:
+                return match.group(0)
+            return "" if pd.isna(row[name]) else str(row[name])
+        items.append((row.get("Id"), BATCH_FIELD_PATTERN.sub(field, template)))
+    return items
+
+def request_chat_batch(messages):
+    """Send several messages in one webhook call and return their replies in order, raising on failure"""
+    payload = {"messages": messages, "user": "streamlit_user"}
+    with get_circuit_breakers()["webhook"].guard():
+        response = get_http_session().post(
+            WEBHOOK_URL,
             json=payload,
             headers={'Content-Type': 'application/json'},
-            timeout=60  # Longer timeout for image processing
+            timeout=http_timeout("webhook")
         )
-        
-        if response.status_code == 200:
-            return response.json().get('response', 'No response received')
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        data = response.json()
+        replies = data.get("responses") if isinstance(data, dict) else data
+        if not isinstance(replies, list) or len(replies) != len(messages):
+            raise RuntimeError(f"batch reply doesn't hold one response per message ({len(messages)} sent)")
+        return [extract_reply_text(reply) for reply in replies]
+
+class BatchJob:
+    """Progress and replies of a batch of messages, aligned to the row Ids they came from"""
+
+    def __init__(self, items):
+        self.ids = [row_id for row_id, _ in items]
+        self.messages = [message for _, message in items]
+        self.replies = [None] * len(items)
+        self.completed = 0
+        self.futures = []
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        return len(self.ids)
+
+    @property
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def record(self, positions, replies):
+        with self._lock:
+            for position, reply in zip(positions, replies):
+                self.replies[position] = reply
+            self.completed += len(positions)
+
+    def results(self):
+        """Replies as a Series indexed by row Id (None for messages still pending)"""
+        return pd.Series(self.replies, index=pd.Index(self.ids, name="Id"), name="reply", dtype=object)
+
+    def wait(self):
+        for future in self.futures:
+            future.result()
+        return self.results()
+
+def run_batch_chunk(job, positions, use_cache=True):
+    """Worker body: answer one batch of a BatchJob, from the cache where possible"""
+    messages = [job.messages[position] for position in positions]
+    if len(messages) == 1:
+        # The single-message protocol; errors come back as reply text
+        job.record(positions, [send_to_webhook(messages[0], use_cache=use_cache)])
+        return
+
+    cache = get_response_cache()
+    keys = [response_cache_key(WEBHOOK_URL, message) for message in messages]
+    replies = [cache.get(key) if use_cache else None for key in keys]
+    missing = [i for i, reply in enumerate(replies) if reply is None]
+    if missing:
+        try:
+            fetched = request_chat_batch([messages[i] for i in missing])
+            for i, reply in zip(missing, fetched):
+                cache.put(keys[i], reply)
+        except Exception as e:
+            fetched = [f"Error sending message: {str(e)}"] * len(missing)
+        for i, reply in zip(missing, fetched):
+            replies[i] = reply
+    job.record(positions, replies)
+
+def submit_batch_job(items, batch_size=WEBHOOK_BATCH_SIZE, use_cache=True):
+    """Queue (Id, message) pairs on the batch pool, batch_size messages per webhook call"""
+    job = BatchJob(items)
+    executor = get_batch_executor()
+    batch_size = max(1, batch_size)
+    for start in range(0, job.total, batch_size):
+        positions = list(range(start, min(start + batch_size, job.total)))
+        job.futures.append(executor.submit(run_batch_chunk, job, positions, use_cache))
+    return job
+
+def send_batch_to_webhook(items, batch_size=WEBHOOK_BATCH_SIZE, use_cache=True):
+    """Send (Id, message) pairs and wait for the replies, returned as a Series indexed by Id"""
+    return submit_batch_job(items, batch_size, use_cache).wait()
+
+class MultipartBody:
+    """Seekable, file-like multipart/form-data body that streams its parts.
+
+    The image bytes are referenced through a memoryview and handed out in
+    the small blocks the HTTP client asks for, so the full body is never
+    assembled in memory. Being seekable lets urllib3 rewind it for retries.
+    """
+
+    # HTML5 form encoding of quoted header parameters, as urllib3 does it
+    HEADER_PARAM_ESCAPES = {ord('"'): "%22", ord("\r"): "%0D", ord("\n"): "%0A"}
+
+    def __init__(self, fields, file_field, filename, data, content_type):
+        self.boundary = os.urandom(16).hex()
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{self._param(name)}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{self._param(file_field)}"; '
+            f'filename="{self._param(filename)}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._parts = [head, memoryview(data), tail]
+        self._starts = [0, len(head), len(head) + len(data)]
+        self._length = self._starts[-1] + len(tail)
+        self._pos = 0
+
+    @classmethod
+    def _param(cls, value):
+        """Escape a value for a quoted Content-Disposition parameter, so it can't end the quote or the header"""
+        return str(value).translate(cls.HEADER_PARAM_ESCAPES)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._length}[whence]
+        self._pos = min(max(base + offset, 0), self._length)
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length - self._pos
+        chunks = []
+        while size > 0 and self._pos < self._length:
+            index = bisect.bisect_right(self._starts, self._pos) - 1
+            offset = self._pos - self._starts[index]
+            chunk = self._parts[index][offset:offset + size]
+            chunks.append(bytes(chunk))
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+def request_image_analysis(image_data, filename, prompt="Analyze this image and suggest creative video ideas"):
+    """Send image to image webhook and return its response, raising on failure or an open circuit"""
+    with get_circuit_breakers()["image_webhook"].guard():
+        if HTTP_ENDPOINTS["image_webhook"]["transport"] == "multipart":
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            body = MultipartBody(
+                {"filename": filename, "prompt": prompt, "user": "streamlit_user"},
+                "image", filename, image_data, content_type
+            )
+            response = get_http_session().post(
+                IMAGE_WEBHOOK_URL,
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=http_timeout("image_webhook")
+            )
         else:
-            return f"Error: {response.status_code} - {response.text}"
+            # Convert image to base64
+            image_base64 = base64.b64encode(image_data).decode('utf-8')
+        
+            payload = {
+                "image": image_base64,
+                "filename": filename,
+                "prompt": prompt,
+                "user": "streamlit_user"
+            }
+        
+            response = get_http_session().post(
+                IMAGE_WEBHOOK_URL,
+                json=payload,
+                headers={'Content-Type': 'application/json'},
+                timeout=http_timeout("image_webhook")  # Longer read timeout for image processing
+            )
+    
+        if response.status_code != 200:
+            raise RuntimeError(f"{response.status_code} - {response.text}")
+        return response.json().get('response', 'No response received')
+
+def send_image_to_webhook(image_data, filename, prompt="Analyze this image and suggest creative video ideas"):
+    """Send image to image webhook and get response"""
+    try:
+        return request_image_analysis(image_data, filename, prompt)
     except Exception as e:
         return f"Error sending image: {str(e)}"
 
+# Images are downscaled and re-encoded before upload unless the original is requested
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", "1600"))  # pixels, longest side
+IMAGE_UPLOAD_QUALITY = int(os.environ.get("IMAGE_UPLOAD_QUALITY", "85"))
+
+def prepare_image_for_upload(image_data, filename, keep_original=False):
+    """Downscale, strip metadata from and re-encode an image for upload.
+
+    Returns (data, filename, stats) where stats records the byte sizes before
+    and after. Opaque images become JPEG and images with transparency WebP,
+    with EXIF orientation applied first. The original bytes are sent when
+    asked for, when the image can't be decoded or is animated, or when
+    re-encoding would not make it smaller.
+    """
+    stats = {"bytes_before": len(image_data), "bytes_after": len(image_data), "reencoded": False}
+    if keep_original:
+        return image_data, filename, stats
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            if getattr(image, "n_frames", 1) > 1:
+                return image_data, filename, stats
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            out = io.BytesIO()
+            if has_alpha:
+                image.convert("RGBA").save(out, format="WEBP", quality=IMAGE_UPLOAD_QUALITY)
+                extension = "webp"
+            else:
+                image.convert("RGB").save(out, format="JPEG", quality=IMAGE_UPLOAD_QUALITY, optimize=True, progressive=True)
+                extension = "jpg"
+    except Exception:
+        return image_data, filename, stats
+
+    data = out.getvalue()
+    if len(data) >= len(image_data):
+        return image_data, filename, stats
+    stats.update(bytes_after=len(data), reencoded=True)
+    return data, f"{os.path.splitext(filename)[0]}.{extension}", stats
+
+def format_upload_stats(stats):
+    """Describe an upload's size reduction and request time for the image history"""
+    if not stats:
+        return ""
+    if stats.get("cached"):
+        return "cached reply"
+    if stats.get("shared"):
+        return "shared in-flight reply"
+    text = f"{stats['bytes_before'] / 1024:.0f} KB"
+    if stats.get("reencoded"):
+        text += f" → {stats['bytes_after'] / 1024:.0f} KB"
+    if "request_seconds" in stats:
+        text += f", {stats['request_seconds']:.1f} s request"
+    return text
+
+# Image analyses run on a bounded pool so a batch upload can't overload the image webhook
+IMAGE_MAX_CONCURRENCY = int(os.environ.get("IMAGE_MAX_CONCURRENCY", "4"))
+IMAGE_POLL_INTERVAL = 1.0  # seconds between checks on queued image jobs
+
+@st.cache_resource
+def get_image_executor():
+    """Thread pool for image webhook calls, shared by every session in this process"""
+    return ThreadPoolExecutor(max_workers=IMAGE_MAX_CONCURRENCY, thread_name_prefix="image")
+
+# Pending uploads are held once in a shared blob store; jobs and session state keep only the hash
+BLOB_STORE_DIR = os.environ.get("BLOB_STORE_DIR", ".blob_store")
+BLOB_MEMORY_BUDGET = int(float(os.environ.get("BLOB_MEMORY_BUDGET_MB", "64")) * 1024 * 1024)
+BLOB_DISK_BUDGET = int(float(os.environ.get("BLOB_DISK_BUDGET_MB", "512")) * 1024 * 1024)
+BLOB_ORPHAN_AGE = float(os.environ.get("BLOB_ORPHAN_AGE", "3600"))  # seconds before a leftover spilled blob is removed
+BLOB_NAME_PATTERN = re.compile(r"[0-9a-f]{64}(\.tmp)?")  # SHA-256 keys, plus half-written spills
+
+class BlobStore:
+    """Content-addressed byte store: recent blobs in memory, older ones spilled to disk.
+
+    put() returns the blob's SHA-256 and stores identical content once, however
+    many sessions or jobs refer to it. Each put() takes a reference that the
+    caller gives back with release(); the blob is deleted once none are left.
+    Past the memory budget the least recently used blobs move to files; past
+    the disk budget the oldest files are deleted, after which get() raises
+    KeyError.
+    """
+
+    def __init__(self, directory, memory_budget, disk_budget):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory = OrderedDict()  # key -> bytes, least recently used first
+        self._memory_bytes = 0
+        self._peak_memory_bytes = 0
+        self._refs = {}  # key -> number of unreleased put() calls
+        self._disk = OrderedDict()  # key -> size, oldest first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        # Blobs only back queued jobs, which don't survive a restart. Only our
+        # own files are touched, and recent ones may belong to another
+        # process sharing the directory, so those are left alone.
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        cutoff = time.time() - BLOB_ORPHAN_AGE
+        for entry in entries:
+            try:
+                if BLOB_NAME_PATTERN.fullmatch(entry.name) and entry.is_file(follow_symlinks=False) \
+                        and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def put(self, data):
+        """Store data and return its key; content already in the store isn't kept twice"""
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._refs[key] = self._refs.get(key, 0) + 1
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            elif key not in self._disk:
+                self._memory[key] = bytes(data)
+                self._memory_bytes += len(data)
+                self._peak_memory_bytes = max(self._peak_memory_bytes, self._memory_bytes)
+                self._spill()
+        return key
+
+    def release(self, key):
+        """Drop one reference taken by put(), deleting the blob when it was the last"""
+        with self._lock:
+            refs = self._refs.get(key, 0) - 1
+            if refs > 0:
+                self._refs[key] = refs
+                return
+            self._refs.pop(key, None)
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            size = self._disk.pop(key, None)
+            if size is None:
+                return
+            self._disk_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key not in self._disk:
+                raise KeyError(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(key)  # evicted from disk while we were reading
+
+    def _spill(self):
+        # Keep the newest blob in memory even if it alone exceeds the budget
+        while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+            key, data = self._memory.popitem(last=False)
+            self._memory_bytes -= len(data)
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(f"{self._path(key)}.tmp", "wb") as f:
+                    f.write(data)
+                os.replace(f"{self._path(key)}.tmp", self._path(key))
+            except OSError:
+                continue  # dropped; its job will fail with a clear error
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_budget and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {"memory_blobs": len(self._memory), "memory_bytes": self._memory_bytes,
+                    "peak_memory_bytes": self._peak_memory_bytes,
+                    "disk_blobs": len(self._disk), "disk_bytes": self._disk_bytes}
+
+@st.cache_resource
+def get_blob_store():
+    """Blob store for pending image uploads, shared by every session in this process"""
+    return BlobStore(BLOB_STORE_DIR, BLOB_MEMORY_BUDGET, BLOB_DISK_BUDGET)
+
+class ImageJob:
+    """One queued image analysis and its status: queued, running, done or failed.
+
+    The image itself stays in the blob store; the job holds only its key.
+    """
+
+    def __init__(self, blob_key, filename, prompt):
+        self.blob_key = blob_key
+        self.filename = filename
+        self.prompt = prompt
+        self.status = "queued"
+        self.response = None
+        self.stats = {}
+        self.future = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+def run_image_job(job, keep_original=False, use_cache=True):
+    """Worker body: shrink and analyze one image, recording the outcome on its job.
+
+    Replies are cached by (webhook URL, image bytes, prompt, keep_original);
+    use_cache=False regenerates.
+    """
+    job.status = "running"
+    try:
+        try:
+            image_data = get_blob_store().get(job.blob_key)
+        except KeyError:
+            raise RuntimeError("the upload expired before it could be analyzed; please upload it again")
+        cache = get_response_cache()
+        key = response_cache_key(IMAGE_WEBHOOK_URL, image_data, job.prompt, keep_original)
+        cached = cache.get(key) if use_cache else None
+        if cached is not None:
+            job.response = cached
+            job.stats = {"cached": True}
+            job.status = "done"
+            return
+
+        def analyze():
+            data, upload_name, job.stats = prepare_image_for_upload(image_data, job.filename, keep_original)
+            started = time.perf_counter()
+            response = request_image_analysis(data, upload_name, job.prompt)
+            job.stats["request_seconds"] = time.perf_counter() - started
+            cache.put(key, response)
+            return response
+
+        # Identical image + prompt requests already in flight share one upload
+        job.response = get_single_flight().do(key, analyze)
+        if not job.stats:
+            job.stats = {"shared": True}
+        job.status = "done"
+    except Exception as e:
+        job.response = f"Error sending image: {str(e)}"
+        job.status = "failed"
+    finally:
+        get_blob_store().release(job.blob_key)
+
+def submit_image_job(image_data, filename, prompt, keep_original=False, use_cache=True):
+    """Queue an image for analysis on the image executor and return its ImageJob.
+
+    Only the blob key is kept on the job, so the bytes are held once per distinct
+    image (and spill to disk under load) rather than once per queued job.
+    """
+    job = ImageJob(get_blob_store().put(image_data), filename, prompt)
+    job.future = get_image_executor().submit(run_image_job, job, keep_original, use_cache)
+    return job
+
 def get_status_class(status):
     """Get CSS class for status badge"""
     if pd.isna(status):
@@ -367,41 +2084,145 @@ def get_status_class(status):
     else:
         return "status-pending"
 
-def display_video_card(row, index):
-    """Display a single enhanced video card"""
+# Card HTML is cached per (template version, part, row hash, search query)
+CARD_TEMPLATE_VERSION = 1
+CARD_HTML_CACHE_SIZE = 5000
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss counters"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+@st.cache_resource
+def get_card_html_cache():
+    """Rendered card HTML shared by every session in this process"""
+    return LRUCache(CARD_HTML_CACHE_SIZE)
+
+def escape_field(value, search_pattern=None):
+    """Escape a sheet value for HTML, highlighting search matches and keeping line breaks"""
+    return highlight_matches(str(value), search_pattern).replace("\n", "<br>")
+
+def render_card_summary_html(row, search_pattern=None):
+    """Build the always-visible part of a card as a single HTML fragment"""
+    status = row.get("production")
+    if pd.isna(status):
+        status = "pending"
+    video_url = row.get("final_output", "")
+    has_video = pd.notna(video_url) and bool(video_url.strip())
+    video_note = "🎬 Video ready" if has_video else "⏳ Video coming soon"
+
+    date_html = ""
+    if pd.notna(row.get("Date")):
+        date_html = f'<div class="card-subtitle">📅 {row["Date"]:%Y-%m-%d}</div>'
+
+    matched_html = ""
+    matched_fields = card_search_matches(row, search_pattern)
+    if matched_fields:
+        matched_html = f'<div class="card-subtitle">🔎 Matched in: {html.escape(", ".join(matched_fields))}</div>'
+
+    # Kept on one line: a blank line would end the HTML block in Markdown
+    return (
+        '<div class="video-card">'
+        '<div class="card-top">'
+        f'<div class="card-header"><span class="card-id">#{escape_field(row["Id"])}</span> {escape_field(row["Idea"], search_pattern)}</div>'
+        f'{date_html}'
+        '</div>'
+        f'<span class="status-badge {get_status_class(status)}">{escape_field(status)}</span> '
+        f'<span class="card-subtitle">{video_note}</span>'
+        f'{matched_html}'
+        '</div>'
+    )
+
+def render_card_details_html(row, search_pattern=None):
+    """Build a card's caption and environment tag as a single HTML fragment"""
+    parts = []
+    if pd.notna(row.get("Caption")):
+        parts.append(f'<div class="caption-text">{escape_field(row["Caption"], search_pattern)}</div>')
+    if pd.notna(row.get("environment_prompt")):
+        parts.append(f'<div class="environment-tag">🎬 {escape_field(row["environment_prompt"], search_pattern)}</div>')
+    return "".join(parts)
+
+def cached_card_html(render, row, row_hash, search_pattern=None):
+    """Return render(row, search_pattern), reusing HTML rendered for an identical row"""
+    if row_hash is None:
+        return render(row, search_pattern)
+    key = (CARD_TEMPLATE_VERSION, render.__name__, int(row_hash), search_pattern.pattern if search_pattern else None)
+    cache = get_card_html_cache()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render(row, search_pattern)
+        cache.put(key, fragment)
+    return fragment
+
+def card_search_matches(row, search_pattern):
+    """List the searchable fields of a row that match the current search"""
+    if search_pattern is None:
+        return []
+    return [
+        field for field in SEARCH_FIELDS
+        if pd.notna(row.get(field)) and search_pattern.search(str(row[field]))
+    ]
+
+@st.fragment
+def display_video_card(row, index, search_pattern=None, row_hash=None, view=None):
+    """Display a single enhanced video card, highlighting search matches.
+
+    Only a light summary (title, date, status, video availability) is
+    rendered up front, as one escaped HTML element cached by row hash. The
+    caption, prompt expander, video player and action buttons are
+    materialized when the viewer opens the card's details, and since the
+    card is a fragment that toggle reruns just this card. When row is a
+    summary row, its long text columns are only then read through view.
+    """
     with st.container():
-        st.markdown('<div class="video-card">', unsafe_allow_html=True)
+        st.markdown(cached_card_html(render_card_summary_html, row, row_hash, search_pattern), unsafe_allow_html=True)
         
-        # Card header with ID and title
-        col1, col2 = st.columns([4, 1])
-        with col1:
-            st.markdown(f'''
-                <div class="card-header">
-                    <span class="card-id">#{row["Id"]}</span>
-                    {row["Idea"]}
-                </div>
-            ''', unsafe_allow_html=True)
-        with col2:
-            if pd.notna(row.get("Date")):
-                st.markdown(f'<div class="card-subtitle">📅 {row["Date"]}</div>', unsafe_allow_html=True)
+        # Everything below is only built once the viewer opens the card
+        if not st.toggle("📂 Show details", key=f"details_{index}"):
+            st.markdown("---")
+            return
         
-        # Status badge
-        status = row.get("production", "Pending")
-        status_class = get_status_class(status)
-        st.markdown(f'<span class="status-badge {status_class}">{status}</span>', unsafe_allow_html=True)
+        if view is not None:
+            row = view.details(index, row)
         
-        # Caption with enhanced styling
-        if pd.notna(row.get("Caption")):
-            st.markdown(f'<div class="caption-text">{row["Caption"]}</div>', unsafe_allow_html=True)
-        
-        # Environment prompt with colorful tag
-        if pd.notna(row.get("environment_prompt")):
-            st.markdown(f'<div class="environment-tag">🎬 {row["environment_prompt"]}</div>', unsafe_allow_html=True)
+        # Caption and environment prompt
+        details_html = cached_card_html(render_card_details_html, row, row_hash, search_pattern)
+        if details_html:
+            st.markdown(details_html, unsafe_allow_html=True)
         
         # Full prompt in expander
         if pd.notna(row.get("Prompt")):
-            with st.expander("🔍 View Full Prompt", expanded=False):
-                st.markdown(f"```\n{row['Prompt']}\n```")
+            with st.expander("🔍 View Full Prompt", expanded="Prompt" in card_search_matches(row, search_pattern)):
+                st.code(str(row["Prompt"]), language=None)
         
         # Video player with enhanced container
         video_url = row.get("final_output", "")
@@ -430,168 +2251,381 @@ def display_video_card(row, index):
             if st.button(f"💬 Comment #{row['Id']}", key=f"comment_{index}"):
                 st.info("Comment feature coming soon!")
         
-        st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
 
+# Session history: the newest entries stay in memory, older ones spill to SQLite
+HISTORY_MEMORY_CAP = int(os.environ.get("HISTORY_MEMORY_CAP", "50"))  # entries per history
+HISTORY_PAGE_SIZE = 10  # entries added per "show older" click
+HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", ".history.sqlite3")
+HISTORY_SPILL_TTL = float(os.environ.get("HISTORY_SPILL_TTL", str(7 * 24 * 3600)))  # seconds
+HISTORY_PRUNE_INTERVAL = float(os.environ.get("HISTORY_PRUNE_INTERVAL", "3600"))  # seconds between expiry sweeps
+
+class HistorySpill:
+    """On-disk store for history entries pushed out of sessions' in-memory buffers"""
+
+    def __init__(self, path, ttl=HISTORY_SPILL_TTL, prune_interval=HISTORY_PRUNE_INTERVAL):
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, entry TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS history_stored_at ON history (stored_at)")
+        with self._lock:
+            self._prune()
+
+    def _prune(self):
+        # Sessions that ended long ago never read their spill again
+        self._db.execute("DELETE FROM history WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+        self._pruned_at = time.monotonic()
+
+    def put(self, session_id, seq, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO history (session_id, seq, entry, stored_at) VALUES (?, ?, ?, ?)",
+                (session_id, seq, json.dumps(entry), time.time())
+            )
+            self._db.commit()
+            # The store lives as long as the process, so expire old rows as it goes
+            if time.monotonic() - self._pruned_at >= self.prune_interval:
+                self._prune()
+
+    def before(self, session_id, seq, limit):
+        """Up to limit entries older than seq, oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT entry FROM history WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, seq, limit)
+            ).fetchall()
+        return [tuple(json.loads(entry)) for entry, in reversed(rows)]
+
+    def clear(self, session_id):
+        with self._lock:
+            self._db.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+@st.cache_resource
+def get_history_spill():
+    """History spill store shared by every session in this process"""
+    return HistorySpill(HISTORY_DB_PATH)
+
+class History:
+    """Bounded session history: a ring buffer of recent entries over a SQLite spill.
+
+    Entries are JSON-serializable tuples. Appending past the cap moves the
+    oldest in-memory entry to the spill store, so memory stays flat however
+    long the session runs; tail(n) reads back from the spill when asked for
+    more than the buffer holds.
+    """
+
+    def __init__(self, cap=HISTORY_MEMORY_CAP):
+        self.session_id = uuid.uuid4().hex
+        self.recent = deque(maxlen=cap)  # (seq, entry) pairs
+        self.next_seq = 0
+        self.first_seq = 0
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def append(self, entry):
+        if len(self.recent) == self.recent.maxlen:
+            seq, oldest = self.recent[0]
+            get_history_spill().put(self.session_id, seq, oldest)
+        self.recent.append((self.next_seq, entry))
+        self.next_seq += 1
+
+    def replace_last(self, entry):
+        seq, _ = self.recent[-1]
+        self.recent[-1] = (seq, entry)
+
+    def tail(self, n):
+        """The newest n entries, oldest first"""
+        entries = [entry for _, entry in list(self.recent)[-n:]]
+        missing = min(n, len(self)) - len(entries)
+        if missing > 0:
+            oldest_in_memory = self.recent[0][0] if self.recent else self.next_seq
+            entries = get_history_spill().before(self.session_id, oldest_in_memory, missing) + entries
+        return entries
+
+    def clear(self):
+        if self.first_seq < self.next_seq - len(self.recent):
+            get_history_spill().clear(self.session_id)
+        self.recent.clear()
+        self.first_seq = self.next_seq
+
+def rerun_fragment():
+    """Rerun only the calling fragment, or the whole app when it is running as part of a full run"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def show_older_button(key, shown_key, total):
+    """Offer to page further back through a history whose visible count is st.session_state[shown_key]"""
+    shown = st.session_state[shown_key]
+    if shown < total and st.button(f"⬆️ Show older ({total - shown} more)", key=key):
+        st.session_state[shown_key] = shown + HISTORY_PAGE_SIZE
+        rerun_fragment()
+
+def file_finished_chat_job():
+    """Move a finished chat job's reply into the history, freeing the panel for the next message"""
+    job = st.session_state.chat_job
+    if job is None or not job.done:
+        return
+    if job.replaces_last and st.session_state.chat_history:
+        st.session_state.chat_history.replace_last((job.label, job.future.result()))
+    else:
+        st.session_state.chat_history.append((job.label, job.future.result()))
+    st.session_state.last_chat_sent = (job.label, job.message)
+    st.session_state.chat_job = None
+
+def chat_controls():
+    """Chat buttons, the pending reply and the history: everything a finishing job changes.
+
+    Rendered by chat_sidebar while idle and by chat_job_status while a reply
+    is pending, so the poll that sees the job finish also re-enables the
+    buttons without rerunning anything else.
+    """
+    file_finished_chat_job()
+    busy = st.session_state.chat_job is not None
+    
+    # Button controls
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("🚀 Send", key="send_chat", disabled=busy):
+            user_input = st.session_state.get("chat_input", "")
+            if user_input.strip():
+                st.session_state.chat_job = submit_chat_job(user_input, user_input)
+                rerun_fragment()
+    
+    with col2:
+        # Ask again for the last reply, bypassing the response cache
+        last_sent = st.session_state.get("last_chat_sent")
+        if st.button("🔁 Regenerate", key="regenerate_chat", disabled=busy or last_sent is None):
+            label, message = last_sent
+            st.session_state.chat_job = submit_chat_job(label, message, use_cache=False)
+            st.session_state.chat_job.replaces_last = True
+            rerun_fragment()
+    
+    with col3:
+        if st.button("🗑️ Clear", key="clear_chat", disabled=busy):
+            st.session_state.chat_history.clear()
+            st.session_state.chat_shown = 5
+            rerun_fragment()
+    
+    # Running request: its streamed reply so far
+    if busy:
+        partial = html.escape(st.session_state.chat_job.partial_text)
+        if partial:
+            st.markdown(f'<div class="chat-message chat-bot">AI: {partial}</div>', unsafe_allow_html=True)
+        st.info("🤖 AI is thinking...")
+    
+    # Display chat history, older turns paged in on demand
+    if st.session_state.chat_history:
+        show_older_button("older_chat", "chat_shown", len(st.session_state.chat_history))
+        for i, (user_msg, bot_msg) in enumerate(st.session_state.chat_history.tail(st.session_state.chat_shown)):
+            st.markdown(f'<div class="chat-message chat-user">You: {html.escape(user_msg)}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="chat-message chat-bot">AI: {html.escape(bot_msg)}</div>', unsafe_allow_html=True)
+    
+    # Quick suggestion buttons
+    st.markdown("### 💡 Quick Ideas")
+    suggestions = [
+        "Futuristic robot scenes",
+        "AI in daily life",
+        "Cyberpunk cityscapes",
+        "Robot emotions",
+        "Tech workplace"
+    ]
+    
+    for i, suggestion in enumerate(suggestions):
+        if st.button(suggestion, key=f"suggest_{i}", disabled=busy):
+            message = f"Give me creative video ideas about: {suggestion}"
+            st.session_state.chat_job = submit_chat_job(suggestion, message)
+            rerun_fragment()
+
+@st.fragment(run_every=CHAT_POLL_INTERVAL)
+def chat_job_status():
+    """chat_controls, polled while a reply is pending; finishing reruns only this fragment"""
+    chat_controls()
+
+@st.fragment
 def chat_sidebar():
-    """Enhanced chat sidebar for video ideas"""
-    st.sidebar.markdown("## 💭 AI Video Ideas Chat")
-    st.sidebar.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    """Enhanced chat sidebar for video ideas; its buttons rerun only this panel"""
+    st.markdown("## 💭 AI Video Ideas Chat")
+    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    
+    notice = circuit_notice("webhook")
+    if notice:
+        st.warning(f"⚠️ {notice}")
     
     # Initialize chat history
     if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = History()
+        st.session_state.chat_shown = 5
     
     # Initialize loading states
     if 'is_loading_chat' not in st.session_state:
         st.session_state.is_loading_chat = False
     
-    if 'pending_message' not in st.session_state:
-        st.session_state.pending_message = ""
-    
-    if 'pending_suggestion' not in st.session_state:
-        st.session_state.pending_suggestion = ""
-    
-    # Process pending chat message
-    if st.session_state.pending_message:
-        st.sidebar.info("🤖 AI is thinking...")
-        try:
-            response = send_to_webhook(st.session_state.pending_message)
-            st.session_state.chat_history.append((st.session_state.pending_message, response))
-        except Exception as e:
-            st.sidebar.error(f"Error: {str(e)}")
-        st.session_state.pending_message = ""
-        st.rerun()
-    
-    # Process pending suggestion
-    if st.session_state.pending_suggestion:
-        st.sidebar.info("🤖 AI is thinking...")
-        try:
-            message = f"Give me creative video ideas about: {st.session_state.pending_suggestion}"
-            response = send_to_webhook(message)
-            st.session_state.chat_history.append((st.session_state.pending_suggestion, response))
-        except Exception as e:
-            st.sidebar.error(f"Error: {str(e)}")
-        st.session_state.pending_suggestion = ""
-        st.rerun()
-    
-    # Display chat history
-    if st.session_state.chat_history:
-        for i, (user_msg, bot_msg) in enumerate(st.session_state.chat_history[-5:]):  # Show last 5
-            st.sidebar.markdown(f'<div class="chat-message chat-user">You: {user_msg}</div>', unsafe_allow_html=True)
-            st.sidebar.markdown(f'<div class="chat-message chat-bot">AI: {bot_msg}</div>', unsafe_allow_html=True)
+    if 'chat_job' not in st.session_state:
+        st.session_state.chat_job = None
     
     # Chat input (don't disable, let user type while processing)
-    user_input = st.sidebar.text_area(
+    st.text_area(
         "Ask for video ideas:", 
         placeholder="e.g., 'Give me ideas for AI robot videos'", 
         height=80,
         key="chat_input"
     )
     
-    # Button controls
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        send_disabled = bool(st.session_state.pending_message or st.session_state.pending_suggestion)
-        if st.button("🚀 Send", key="send_chat", disabled=send_disabled):
-            if user_input.strip():
-                st.session_state.pending_message = user_input
-                st.rerun()
+    # A running request is polled by its own fragment so the rest of the page stays usable
+    if st.session_state.chat_job is not None:
+        chat_job_status()
+    else:
+        chat_controls()
     
-    with col2:
-        clear_disabled = bool(st.session_state.pending_message or st.session_state.pending_suggestion)
-        if st.button("🗑️ Clear", key="clear_chat", disabled=clear_disabled):
-            st.session_state.chat_history = []
-            st.rerun()
+    response_cache = get_response_cache()
+    st.caption(f"♻️ Response cache: {response_cache.hits} hits, {response_cache.misses} misses")
+    with st.expander("🩺 Webhook health", expanded=False):
+        st.dataframe(
+            pd.DataFrame([breaker.status() for breaker in get_circuit_breakers().values()]).set_index("endpoint"),
+            use_container_width=True
+        )
+        blobs = get_blob_store().stats()
+        st.caption(
+            f"🗂️ Pending uploads: {blobs['memory_blobs']} in memory ({blobs['memory_bytes'] / 2**20:.1f} MB, "
+            f"peak {blobs['peak_memory_bytes'] / 2**20:.1f} MB), "
+            f"{blobs['disk_blobs']} on disk ({blobs['disk_bytes'] / 2**20:.1f} MB)"
+        )
     
-    # Quick suggestion buttons
-    st.sidebar.markdown("### 💡 Quick Ideas")
-    suggestions = [
-        "Futuristic robot scenes",
-        "AI in daily life",
-        "Cyberpunk cityscapes",
-        "Robot emotions",
-        "Tech workplace"
-    ]
+    st.markdown('</div>', unsafe_allow_html=True)
+
+IMAGE_JOB_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+
+def image_results():
+    """Queued analyses and the analysis history: everything a finishing image job changes.
+
+    Rendered by image_upload_sidebar while idle and by image_queue_status
+    while jobs are queued, so the poll that sees a job finish files it
+    without rerunning anything else.
+    """
+    jobs = st.session_state.image_jobs
+    finished = [job for job in jobs if job.finished]
+    if finished:
+        for job in finished:
+            st.session_state.image_history.append((job.filename, job.prompt, job.response, job.stats))
+        st.session_state.image_jobs = jobs = [job for job in jobs if not job.finished]
     
-    buttons_disabled = bool(st.session_state.pending_message or st.session_state.pending_suggestion)
-    for i, suggestion in enumerate(suggestions):
-        if st.sidebar.button(suggestion, key=f"suggest_{i}", disabled=buttons_disabled):
-            st.session_state.pending_suggestion = suggestion
-            st.rerun()
+    # Queued and running analyses
+    if jobs:
+        st.markdown(f"**🔍 Analyzing {len(jobs)} image(s)...**")
+        for job in jobs:
+            st.markdown(f"{IMAGE_JOB_ICONS[job.status]} {html.escape(job.filename[:30])} — {job.status}")
+    
+    # Display image analysis history
+    if st.session_state.image_history:
+        st.markdown("### 📋 Recent Analysis")
+        show_older_button("older_images", "image_shown", len(st.session_state.image_history))
+        for i, (filename, prompt, response, stats) in enumerate(st.session_state.image_history.tail(st.session_state.image_shown)):
+            with st.expander(f"🖼️ {filename[:20]}...", expanded=False):
+                st.markdown(f"**Prompt:** {prompt}")
+                if stats:
+                    st.markdown(f"**Upload:** {format_upload_stats(stats)}")
+                st.markdown(f"**Response:** {response[:200]}...")
     
-    st.sidebar.markdown('</div>', unsafe_allow_html=True)
+    # Clear history button
+    if st.session_state.image_history:
+        if st.button("🗑️ Clear Image History", key="clear_image_history"):
+            st.session_state.image_history.clear()
+            st.session_state.image_shown = 3
+            rerun_fragment()
+
+@st.fragment(run_every=IMAGE_POLL_INTERVAL)
+def image_queue_status():
+    """image_results, polled while jobs are queued; finishing reruns only this fragment"""
+    image_results()
 
+@st.fragment
 def image_upload_sidebar():
-    """Enhanced image upload sidebar for AI analysis"""
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("## 🖼️ AI Image Analysis")
-    st.sidebar.markdown('<div class="image-container">', unsafe_allow_html=True)
+    """Enhanced image upload sidebar for AI analysis; its widgets rerun only this panel"""
+    st.markdown("---")
+    st.markdown("## 🖼️ AI Image Analysis")
+    st.markdown('<div class="image-container">', unsafe_allow_html=True)
+    
+    notice = circuit_notice("image_webhook")
+    if notice:
+        st.warning(f"⚠️ {notice}")
     
     # Initialize image states
     if 'image_history' not in st.session_state:
-        st.session_state.image_history = []
-    
-    if 'pending_image' not in st.session_state:
-        st.session_state.pending_image = None
-    
-    if 'pending_image_prompt' not in st.session_state:
-        st.session_state.pending_image_prompt = ""
+        st.session_state.image_history = History()
+        st.session_state.image_shown = 3
     
-    # Process pending image
-    if st.session_state.pending_image:
-        st.sidebar.info("🔍 AI is analyzing your image...")
-        try:
-            image_data, filename, prompt = st.session_state.pending_image
-            response = send_image_to_webhook(image_data, filename, prompt)
-            st.session_state.image_history.append((filename, prompt, response))
-        except Exception as e:
-            st.sidebar.error(f"Error: {str(e)}")
-        st.session_state.pending_image = None
-        st.rerun()
+    if 'image_jobs' not in st.session_state:
+        st.session_state.image_jobs = []
     
     # Image upload section
-    st.sidebar.markdown("### 📤 Upload Image")
-    uploaded_file = st.sidebar.file_uploader(
-        "Choose an image...",
+    st.markdown("### 📤 Upload Images")
+    uploaded_files = st.file_uploader(
+        "Choose images...",
         type=['png', 'jpg', 'jpeg', 'gif', 'webp'],
+        accept_multiple_files=True,
         key="image_uploader",
-        help="Upload an image to get AI-generated video ideas based on it"
+        help="Upload one or more images to get AI-generated video ideas based on them"
     )
     
     # Custom prompt for image analysis
-    image_prompt = st.sidebar.text_area(
+    image_prompt = st.text_area(
         "Custom analysis prompt:",
         placeholder="Analyze this image and suggest creative video ideas",
         height=60,
         key="image_prompt_input"
     )
     
+    send_original = st.checkbox(
+        "📎 Send original image",
+        value=False,
+        key="send_original_image",
+        help="Skip downscaling and re-encoding before upload"
+    )
+    
+    regenerate_images = st.checkbox(
+        "🔁 Regenerate (skip cached replies)",
+        value=False,
+        key="regenerate_images",
+        help="Ask the image webhook again even if this image and prompt were analyzed before"
+    )
+    
     # Show uploaded image preview
-    if uploaded_file is not None:
-        st.sidebar.markdown('<div class="upload-zone">', unsafe_allow_html=True)
-        st.sidebar.image(uploaded_file, caption=f"📸 {uploaded_file.name}", use_column_width=True)
+    if uploaded_files:
+        st.markdown('<div class="upload-zone">', unsafe_allow_html=True)
+        if len(uploaded_files) == 1:
+            st.image(uploaded_files[0], caption=f"📸 {uploaded_files[0].name}", use_column_width=True)
+        else:
+            st.image(uploaded_files, caption=[f"📸 {f.name[:12]}" for f in uploaded_files], width=80)
         
-        col1, col2 = st.sidebar.columns(2)
+        col1, col2 = st.columns(2)
         with col1:
-            analyze_disabled = bool(st.session_state.pending_image)
-            if st.sidebar.button("🔍 Analyze", key="analyze_image", disabled=analyze_disabled):
-                # Read image data
-                image_data = uploaded_file.getvalue()
+            if st.button("🔍 Analyze", key="analyze_image"):
                 prompt = image_prompt.strip() if image_prompt.strip() else "Analyze this image and suggest creative video ideas"
-                st.session_state.pending_image = (image_data, uploaded_file.name, prompt)
-                st.rerun()
+                for uploaded_file in uploaded_files:
+                    st.session_state.image_jobs.append(submit_image_job(uploaded_file.getvalue(), uploaded_file.name, prompt, send_original, not regenerate_images))
+                rerun_fragment()
         
         with col2:
-            if st.sidebar.button("🗑️ Remove", key="remove_image"):
+            if st.button("🗑️ Remove", key="remove_image"):
                 # Force a rerun to clear the uploader
-                st.rerun()
+                rerun_fragment()
         
-        st.sidebar.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
     
     # Quick analysis prompts
-    if uploaded_file is not None:
-        st.sidebar.markdown("### ⚡ Quick Analysis")
+    if uploaded_files:
+        st.markdown("### ⚡ Quick Analysis")
         quick_prompts = [
             "Video ideas from this image",
             "Create story scenarios",
@@ -601,26 +2635,168 @@ def image_upload_sidebar():
         ]
         
         for i, prompt in enumerate(quick_prompts):
-            if st.sidebar.button(prompt, key=f"quick_prompt_{i}"):
-                image_data = uploaded_file.getvalue()
-                st.session_state.pending_image = (image_data, uploaded_file.name, prompt)
-                st.rerun()
+            if st.button(prompt, key=f"quick_prompt_{i}"):
+                for uploaded_file in uploaded_files:
+                    st.session_state.image_jobs.append(submit_image_job(uploaded_file.getvalue(), uploaded_file.name, prompt, send_original, not regenerate_images))
+                rerun_fragment()
     
-    # Display image analysis history
-    if st.session_state.image_history:
-        st.sidebar.markdown("### 📋 Recent Analysis")
-        for i, (filename, prompt, response) in enumerate(st.session_state.image_history[-3:]):  # Show last 3
-            with st.sidebar.expander(f"🖼️ {filename[:20]}...", expanded=False):
-                st.markdown(f"**Prompt:** {prompt}")
-                st.markdown(f"**Response:** {response[:200]}...")
+    # Queued analyses are polled by their own fragment so the rest of the page stays usable
+    if st.session_state.image_jobs:
+        image_queue_status()
+    else:
+        image_results()
     
-    # Clear history button
-    if st.session_state.image_history:
-        if st.sidebar.button("🗑️ Clear Image History", key="clear_image_history"):
-            st.session_state.image_history = []
-            st.rerun()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+BATCH_DEFAULT_TEMPLATE = "Write a short, catchy social media caption for this AI video idea: {Idea}"
+
+def batch_controls(rows, template):
+    """Run button and the batch's progress or replies: everything a finishing batch changes.
+
+    Rendered by batch_ideas_panel while idle and by batch_job_status while a
+    batch runs, so the poll that sees it finish re-enables the button
+    without rerunning anything else.
+    """
+    job = st.session_state.batch_job
+    running = job is not None and not job.done
+    if st.button(f"🚀 Run batch ({len(rows)} rows)", key="run_batch", disabled=running or rows.empty):
+        st.session_state.batch_job = submit_batch_job(batch_messages(rows, template))
+        rerun_fragment()
+    
+    if running:
+        st.progress(job.completed / job.total, text=f"🤖 {job.completed} / {job.total} rows answered...")
+    elif job is not None:
+        show_batch_results(job)
+
+@st.fragment(run_every=CHAT_POLL_INTERVAL)
+def batch_job_status(rows, template):
+    """batch_controls, polled while a batch runs; finishing reruns only this fragment"""
+    batch_controls(rows, template)
+
+def show_batch_results(job):
+    """Finished batch: replies next to their row Ids, with a CSV download"""
+    results = job.results().reset_index()
+    results.insert(1, "message", job.messages)
+    st.success(f"✅ {job.total} rows answered")
+    st.dataframe(results, use_container_width=True, hide_index=True)
+    st.download_button(
+        "⬇️ Download replies (CSV)", results.to_csv(index=False), file_name="batch_replies.csv", mime="text/csv"
+    )
+
+@st.fragment
+def batch_ideas_panel(df):
+    """Ask the webhook for ideas for many rows at once"""
+    if 'batch_job' not in st.session_state:
+        st.session_state.batch_job = None
     
-    st.sidebar.markdown('</div>', unsafe_allow_html=True)
+    with st.expander("📦 Batch Ideas", expanded=st.session_state.batch_job is not None):
+        text_columns = [column for column in SHEET_TEXT_COLUMNS if column in df.columns]
+        col1, col2 = st.columns(2)
+        with col1:
+            target = st.selectbox("Rows missing:", ["(all rows)"] + text_columns, index=1 + text_columns.index("Caption") if "Caption" in text_columns else 0)
+        template = st.text_area(
+            "Message template:",
+            value=BATCH_DEFAULT_TEMPLATE,
+            help="Use {Column} to insert a row's value, e.g. {Idea} or {Prompt}"
+        )
+        rows = df if target == "(all rows)" else rows_missing(df, target)
+        with col2:
+            st.markdown(f"**{len(rows)}** rows selected")
+        
+        # A running batch is polled by its own fragment so the rest of the page stays usable
+        job = st.session_state.batch_job
+        if job is not None and not job.done:
+            batch_job_status(rows, template)
+        else:
+            batch_controls(rows, template)
+
+@st.fragment
+def metrics_strip(counts):
+    """Headline counts for the current sheet version"""
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(f'''
+            <div class="metric-card">
+                <div class="metric-number">{counts["total"]}</div>
+                <div class="metric-label">Total Videos</div>
+            </div>
+        ''', unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f'''
+            <div class="metric-card" style="background: linear-gradient(135deg, #48bb78, #38a169);">
+                <div class="metric-number">{counts["done"]}</div>
+                <div class="metric-label">Completed</div>
+            </div>
+        ''', unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(f'''
+            <div class="metric-card" style="background: linear-gradient(135deg, #ed8936, #dd6b20);">
+                <div class="metric-number">{counts["pending"]}</div>
+                <div class="metric-label">Pending</div>
+            </div>
+        ''', unsafe_allow_html=True)
+
+    with col4:
+        st.markdown(f'''
+            <div class="metric-card" style="background: linear-gradient(135deg, #4ecdc4, #44a08d);">
+                <div class="metric-number">{counts["with_video"]}</div>
+                <div class="metric-label">With Video</div>
+            </div>
+        ''', unsafe_allow_html=True)
+
+@st.fragment
+def video_card_list(view, query, total_rows, row_hashes):
+    """Sort, paginate and render the filtered cards; sort and page changes rerun only this list.
+
+    Filters live in the sidebar and change the query itself, so they still
+    rerun the page; this fragment reuses the query from the last full run.
+    """
+    # Sort options
+    sort_col1, sort_col2 = st.columns(2)
+    with sort_col1:
+        sort_options = ["Id (Newest)", "Id (Oldest)", "Status", "Date"]
+        if query.search:
+            sort_options = ["Relevance"] + sort_options
+        sort_by = st.selectbox("🔄 Sort by:", sort_options)
+    with sort_col2:
+        items_per_page = st.selectbox("📄 Items per page:", [5, 10, 20, 50], index=1)
+    query = replace(query, sort_by=sort_by)
+    no_id = view.snapshot.index.counts["no_id"]
+    if no_id:
+        st.caption(f"⚠️ {no_id} videos have no valid Id and are listed last when sorting by Id")
+
+    # Pagination: a slice of the memoized sorted positions
+    total_items = len(view.sorted(query))
+    page = 1
+    if total_items > items_per_page:
+        total_pages = (total_items - 1) // items_per_page + 1
+        page = st.selectbox(f"📄 Page (1-{total_pages}):", range(1, total_pages + 1))
+    # Long text is left out unless a search needs it to show where each card matched
+    page_df = view.page(query, page, items_per_page, summary_only=not query.search)
+
+    # Display results info
+    if len(page_df) != total_rows:
+        st.info(f"📊 Showing {len(page_df)} of {total_rows} videos")
+
+    # Display video cards
+    if not page_df.empty:
+        st.markdown("### 🎬 Your Video Collection")
+        search_pattern = search_term_pattern(query.search)
+        for index, row in page_df.iterrows():
+            display_video_card(row, index, search_pattern, row_hashes[index], view)
+    else:
+        st.warning("🔍 No videos match your current filters. Try adjusting your search criteria!")
+
+@st.fragment(run_every=SHEET_VERSION_CHECK_INTERVAL)
+def auto_refresh_watcher(csv_url):
+    """Rerun the page only when the background poller has published a newer sheet"""
+    get_sheet_poller().watch(csv_url)
+    snapshot = get_sheet_cache().peek(csv_url)
+    if snapshot is not None and st.session_state.get("sheet_version") != (csv_url, snapshot.version):
+        st.rerun()
 
 def main():
     # Enhanced header
@@ -648,6 +2824,7 @@ def main():
             auto_refresh = st.checkbox("🔄 Auto-refresh", value=False)
         with col2:
             if st.button("↻ Refresh"):
+                get_sheet_cache().invalidate(resolve_csv_url(sheet_url))
                 st.session_state.data_loading = True
                 st.rerun()
         
@@ -672,12 +2849,26 @@ def main():
         
         if st.session_state.data_loading:
             st.info("🔄 Loading your awesome videos...")
-            df = load_data_from_gsheets(sheet_url)
+            snapshot = load_sheet_snapshot(sheet_url)
             st.session_state.data_loading = False
         else:
-            df = load_data_from_gsheets(sheet_url)
+            snapshot = load_sheet_snapshot(sheet_url)
+        
+        df = snapshot.df if snapshot is not None else None
+        
+        # Tell the user what changed since the version this session last saw
+        if snapshot is not None:
+            seen = st.session_state.get("sheet_version")
+            current = (resolve_csv_url(sheet_url), snapshot.version)
+            if seen is not None and seen[0] == current[0] and seen[1] != current[1]:
+                summary = describe_diff(snapshot.diff)
+                if summary:
+                    st.info(f"🆕 {summary}")
+            st.session_state.sheet_version = current
         
         if df is not None and not df.empty:
+            index = snapshot.index
+            
             # Navigation pills for quick filtering
             st.markdown("### 🎯 Quick Navigation")
             nav_cols = st.columns(5)
@@ -690,137 +2881,57 @@ def main():
                         selected_nav = option
             
             # Enhanced metrics with colorful cards
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.markdown(f'''
-                    <div class="metric-card">
-                        <div class="metric-number">{len(df)}</div>
-                        <div class="metric-label">Total Videos</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-            
-            with col2:
-                done_count = len(df[df.get("production", "").str.lower() == "done"]) if "production" in df.columns else 0
-                st.markdown(f'''
-                    <div class="metric-card" style="background: linear-gradient(135deg, #48bb78, #38a169);">
-                        <div class="metric-number">{done_count}</div>
-                        <div class="metric-label">Completed</div>
-                    </div>
-                ''', unsafe_allow_html=True)
-            
-            with col3:
-                pending_count = len(df) - done_count
-                st.markdown(f'''
-                    <div class="metric-card" style="background: linear-gradient(135deg, #ed8936, #dd6b20);">
-                        <div class="metric-number">{pending_count}</div>
-                        <div class="metric-label">Pending</div>
-                    </div>
-                ''', unsafe_allow_html=True)
+            metrics_strip(index.counts)
             
-            with col4:
-                videos_with_output = len(df[df.get("final_output", "").notna() & (df.get("final_output", "") != "")])
-                st.markdown(f'''
-                    <div class="metric-card" style="background: linear-gradient(135deg, #4ecdc4, #44a08d);">
-                        <div class="metric-number">{videos_with_output}</div>
-                        <div class="metric-label">With Video</div>
-                    </div>
-                ''', unsafe_allow_html=True)
+            batch_ideas_panel(df)
             
             # Advanced filters
             with st.sidebar:
                 show_advanced = st.checkbox("🔧 Advanced Filters", value=False)
                 
-                filtered_df = df.copy()
+                status_filter = "All"
+                search_term = ""
+                date_from = date_to = None
                 
                 if show_advanced:
                     # Status filter
                     if "production" in df.columns:
-                        status_options = ["All"] + sorted(df["production"].dropna().unique().tolist())
+                        status_options = ["All"] + sorted(status for status, mask in index.status_masks.items() if mask.any())
                         status_filter = st.selectbox("📊 Status Filter:", status_options)
-                        if status_filter != "All":
-                            filtered_df = filtered_df[filtered_df["production"] == status_filter]
                     
                     # Search filter
-                    search_term = st.text_input("🔍 Search Videos:", placeholder="Search ideas, captions...")
-                    if search_term:
-                        mask = (
-                            filtered_df.get("Idea", "").str.contains(search_term, case=False, na=False) |
-                            filtered_df.get("Caption", "").str.contains(search_term, case=False, na=False)
-                        )
-                        filtered_df = filtered_df[mask]
+                    search_term = st.text_input("🔍 Search Videos:", placeholder="Search ideas, captions, prompts...")
                     
-                    # Date range filter
-                    if "Date" in df.columns and not df["Date"].isna().all():
+                    # Date range filter; leave either end empty for an open range
+                    if len(index.sorted_dates):
                         date_filter = st.checkbox("📅 Filter by Date")
                         if date_filter:
-                            st.date_input("From Date:", key="start_date")
-                            st.date_input("To Date:", key="end_date")
+                            first_date = pd.Timestamp(index.sorted_dates[0]).date()
+                            last_date = pd.Timestamp(index.sorted_dates[-1]).date()
+                            date_from = st.date_input(
+                                "From Date:", value=None, min_value=first_date, max_value=last_date, key="start_date"
+                            )
+                            date_to = st.date_input(
+                                "To Date:", value=None, min_value=first_date, max_value=last_date, key="end_date"
+                            )
+                            if index.counts["undated"] and (date_from or date_to):
+                                st.caption(f"⚠️ {index.counts['undated']} videos have no valid date and are hidden by this filter")
             
-            # Apply navigation filter
-            if selected_nav == "Completed":
-                filtered_df = filtered_df[filtered_df.get("production", "").str.lower() == "done"]
-            elif selected_nav == "Pending":
-                filtered_df = filtered_df[filtered_df.get("production", "").str.lower() != "done"]
-            elif selected_nav == "With Video":
-                filtered_df = filtered_df[filtered_df.get("final_output", "").notna() & (filtered_df.get("final_output", "") != "")]
-            elif selected_nav == "Recent":
-                if "Id" in filtered_df.columns:
-                    filtered_df = filtered_df.nlargest(10, "Id")
-            
-            # Sort options
-            sort_col1, sort_col2 = st.columns(2)
-            with sort_col1:
-                sort_by = st.selectbox("🔄 Sort by:", ["Id (Newest)", "Id (Oldest)", "Status", "Date"])
-            with sort_col2:
-                items_per_page = st.selectbox("📄 Items per page:", [5, 10, 20, 50], index=1)
-            
-            # Apply sorting
-            if "Id" in filtered_df.columns:
-                if sort_by == "Id (Newest)":
-                    filtered_df = filtered_df.sort_values("Id", ascending=False)
-                elif sort_by == "Id (Oldest)":
-                    filtered_df = filtered_df.sort_values("Id", ascending=True)
-                elif sort_by == "Status":
-                    filtered_df = filtered_df.sort_values("production", ascending=True, na_position='last')
-            
-            # Pagination
-            total_items = len(filtered_df)
-            if total_items > items_per_page:
-                total_pages = (total_items - 1) // items_per_page + 1
-                page = st.selectbox(f"📄 Page (1-{total_pages}):", range(1, total_pages + 1))
-                start_idx = (page - 1) * items_per_page
-                end_idx = start_idx + items_per_page
-                filtered_df = filtered_df.iloc[start_idx:end_idx]
-            
-            # Display results info
-            if len(filtered_df) != len(df):
-                st.info(f"📊 Showing {len(filtered_df)} of {len(df)} videos")
-            
-            # Display video cards
-            if not filtered_df.empty:
-                st.markdown("### 🎬 Your Video Collection")
-                for index, row in filtered_df.iterrows():
-                    display_video_card(row, index)
-            else:
-                st.warning("🔍 No videos match your current filters. Try adjusting your search criteria!")
+            # Filters and navigation become one query; sorting and paging happen in the card list
+            query = ViewQuery(
+                status=status_filter, search=search_term.strip(), nav=selected_nav or "All Videos",
+                date_from=date_from, date_to=date_to
+            )
+            video_card_list(snapshot.view, query, len(df), snapshot.row_hashes.to_numpy())
                 
         elif df is not None:
             st.warning("📭 The Google Sheets appears to be empty. Add some video data to get started!")
         else:
             st.error("❌ Could not load data. Please check your Google Sheets URL and sharing settings.")
     
-    # Auto-refresh logic (simplified to avoid conflicts)
-    if auto_refresh:
-        # Use a more controlled auto-refresh approach
-        if 'last_refresh' not in st.session_state:
-            st.session_state.last_refresh = time.time()
-        
-        current_time = time.time()
-        if current_time - st.session_state.last_refresh > 30:  # 30 seconds
-            st.session_state.last_refresh = current_time
-            st.session_state.data_loading = True
-            st.rerun()
+    # Auto-refresh: the shared poller fetches, this session only checks versions
+    if auto_refresh and sheet_url:
+        auto_refresh_watcher(resolve_csv_url(sheet_url))
 
 if __name__ == "__main__":
     main()